@@ -0,0 +1,78 @@
+import timeit
+
+import numpy as np
+from scipy.stats import weibull_min
+
+from Prediction_EOL_engine import _weibull_cdf_row, retirement_cdf_tensor
+from Prediction_EOL_parameters import PEV_WEIBULL_PARAMS, PEV_YEARS
+
+# Weibull parameters of the PEV battery models
+weibull_params = PEV_WEIBULL_PARAMS
+models = list(weibull_params)
+years = PEV_YEARS
+sales_years = np.asarray(PEV_YEARS)
+number_of_cities = 364
+
+# LE scenario: 10% longer lifetime from 2024
+adjustment_factors = [1.1 if year >= 2024 else 1.0 for year in years]
+
+
+# Previous implementation: one scipy call per (model, retirement year, sales year) term
+def calculate_weibull_retirement(sales_year, current_year, shape, scale, adjustment_factor=1.0):
+    if current_year <= sales_year:
+        return 0
+    age = current_year - sales_year
+    return weibull_min.cdf(age, shape, scale=scale * adjustment_factor)
+
+
+def scipy_scalar_tensor():
+    cdf = np.zeros((len(models), len(years), len(sales_years)))
+    for i, model in enumerate(models):
+        for j, year in enumerate(years):
+            for k, sales_year in enumerate(sales_years):
+                cdf[i, j, k] = calculate_weibull_retirement(sales_year, year, weibull_params[model]['shape'],
+                                                            weibull_params[model]['scale'], adjustment_factors[j])
+    return cdf
+
+
+# scipy evaluated on the whole age matrix at once
+def scipy_vectorized_tensor():
+    age = np.subtract.outer(np.asarray(years), sales_years).astype(float)
+    scale_factor = np.asarray(adjustment_factors)[:, None]
+    cdf = np.stack([
+        weibull_min.cdf(age, weibull_params[model]['shape'], scale=weibull_params[model]['scale'] * scale_factor)
+        for model in models
+    ])
+    cdf[:, age <= 0] = 0
+    return cdf
+
+
+# Cached closed-form lookup table
+def lookup_table_tensor():
+    return retirement_cdf_tensor(years, sales_years, models, weibull_params, adjustment_factors)
+
+
+def cold_lookup_table_tensor():
+    _weibull_cdf_row.cache_clear()
+    return lookup_table_tensor()
+
+
+if __name__ == '__main__':
+    reference = scipy_scalar_tensor()
+    print(f"Max abs difference, scipy vectorized vs scalar: {np.abs(scipy_vectorized_tensor() - reference).max():.3e}")
+    print(f"Max abs difference, lookup table vs scalar: {np.abs(lookup_table_tensor() - reference).max():.3e}")
+
+    benchmarks = [
+        ('scipy scalar calls (per city)', scipy_scalar_tensor, 3),
+        ('scipy vectorized', scipy_vectorized_tensor, 200),
+        ('lookup table, cold cache', cold_lookup_table_tensor, 200),
+        ('lookup table, warm cache', lookup_table_tensor, 200),
+    ]
+    print(f"{'Method':<32}{'Time per tensor (ms)':>22}")
+    for name, function, number in benchmarks:
+        seconds = min(timeit.repeat(function, number=number, repeat=3)) / number
+        print(f"{name:<32}{seconds * 1e3:>22.3f}")
+
+    # The previous scripts evaluated the scalar path once per city
+    scalar_seconds = min(timeit.repeat(scipy_scalar_tensor, number=1, repeat=3))
+    print(f"Previous scripts, {number_of_cities} cities: ~{scalar_seconds * number_of_cities:.1f} s of scipy calls")
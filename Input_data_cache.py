@@ -0,0 +1,100 @@
+import hashlib
+import os
+
+import pandas as pd
+from openpyxl import load_workbook
+
+# Cache of the parsed input workbooks (relative path)
+INPUT_CACHE_DIR = './input data/cache'
+
+# Key columns stored as categoricals
+CATEGORICAL_COLUMNS = ['Province', 'City', 'Scenario', 'Battery type']
+
+# Bump when normalize_input_table changes, so that older caches are rebuilt
+CACHE_VERSION = 1
+
+
+# Content hash of a workbook sheet
+def input_digest(path, sheet_name=0):
+    """
+    :param path: Workbook path
+    :param sheet_name: Sheet name or position
+    :return: Hex digest of the file content, the sheet and the cache version
+    """
+    digest = hashlib.sha256(repr((CACHE_VERSION, sheet_name)).encode())
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Normalize the dtypes of an input table
+def normalize_input_table(df):
+    """
+    Strip all string columns, store the key columns as categoricals and integral years as int
+    :param df: Table as read from the workbook
+    :return: Normalized DataFrame
+    """
+    df = df.copy()
+    for column in df.columns:
+        if pd.api.types.infer_dtype(df[column], skipna=True) == 'string':
+            df[column] = df[column].str.strip()
+            if column in CATEGORICAL_COLUMNS:
+                df[column] = df[column].astype('category')
+    if 'Year' in df.columns:
+        years = pd.to_numeric(df['Year'], errors='coerce')
+        if years.notna().all() and (years % 1 == 0).all():
+            df['Year'] = years.astype(int)
+    return df
+
+
+# Read an input workbook through the Parquet cache
+def read_input_table(path, sheet_name=0, cache_dir=INPUT_CACHE_DIR):
+    """
+    Parse the workbook once and serve later loads from a Parquet copy keyed by the file content hash;
+    a changed workbook gets a new key and its stale copies are removed
+    :param path: Workbook path
+    :param sheet_name: Sheet name or position
+    :param cache_dir: Cache directory
+    :return: DataFrame from normalize_input_table
+    """
+    prefix = f"{os.path.splitext(os.path.basename(path))[0]}.{sheet_name}."
+    cache_path = os.path.join(cache_dir, f"{prefix}{input_digest(path, sheet_name)[:16]}.parquet")
+    if os.path.exists(cache_path):
+        return pd.read_parquet(cache_path)
+
+    df = normalize_input_table(pd.read_excel(path, sheet_name=sheet_name))
+    os.makedirs(cache_dir, exist_ok=True)
+    for file_name in os.listdir(cache_dir):
+        if file_name.startswith(prefix) and file_name.endswith('.parquet'):
+            os.remove(os.path.join(cache_dir, file_name))
+    df.to_parquet(cache_path, index=False)
+    return df
+
+
+# Stream a workbook sheet in chunks of rows
+def iter_workbook_chunks(path, sheet_name=0, chunk_size=100000):
+    """
+    Read the sheet row by row in openpyxl read-only mode, so memory is bounded by the chunk size instead of
+    the size of the workbook; the first row holds the column names
+    :param path: Workbook path
+    :param sheet_name: Sheet name or position
+    :param chunk_size: Rows per chunk
+    :return: Generator of DataFrames from normalize_input_table
+    """
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if isinstance(sheet_name, str) else workbook.worksheets[sheet_name]
+        rows = sheet.iter_rows(values_only=True)
+        columns = list(next(rows))
+        chunk = []
+        for row in rows:
+            if any(value is not None for value in row):  # Skip empty rows
+                chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield normalize_input_table(pd.DataFrame(chunk, columns=columns))
+                chunk = []
+        if chunk:
+            yield normalize_input_table(pd.DataFrame(chunk, columns=columns))
+    finally:
+        workbook.close()
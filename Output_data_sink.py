@@ -0,0 +1,99 @@
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+
+
+# Writer of the result sheets of one simulation output
+class ResultSink:
+    """
+    Write the result tables (sheets) of one output. Columnar formats store one file per sheet in a directory
+    named after output_path ('parquet': <stem>/<sheet>.parquet, 'arrow': <stem>/<sheet>.arrow as Arrow IPC);
+    'excel' streams all sheets into <stem>.xlsx with an openpyxl write-only workbook, so memory stays constant.
+    A sheet may be written in several chunks; use the sink as a context manager, or call close.
+    """
+
+    def __init__(self, output_path, formats=('parquet',)):
+        """
+        :param output_path: Output path; its extension is replaced per format
+        :param formats: Any of 'parquet', 'arrow' and 'excel'
+        """
+        unknown = set(formats) - {'parquet', 'arrow', 'excel'}
+        if unknown:
+            raise ValueError(f"Unknown output formats: {sorted(unknown)}")
+        self.stem = os.path.splitext(output_path)[0]
+        self.formats = list(formats)
+        self.schemas = {}
+        self.writers = {}
+        self.paths = []
+        self.workbook = Workbook(write_only=True) if 'excel' in self.formats else None
+        self.worksheets = {}
+        os.makedirs(os.path.dirname(self.stem) or '.', exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # Append the rows of df to a sheet
+    def write(self, sheet_name, df):
+        table = pa.Table.from_pandas(df, schema=self.schemas.get(sheet_name), preserve_index=False)
+        self.schemas.setdefault(sheet_name, table.schema)
+        for file_format in self.formats:
+            if file_format == 'excel':
+                self._write_excel(sheet_name, df)
+                continue
+            key = (file_format, sheet_name)
+            if key not in self.writers:
+                path = os.path.join(self.stem, f"{sheet_name}.{file_format}")
+                os.makedirs(self.stem, exist_ok=True)
+                if file_format == 'parquet':
+                    self.writers[key] = pq.ParquetWriter(path, table.schema)
+                else:
+                    self.writers[key] = pa.ipc.new_file(path, table.schema)
+                self.paths.append(path)
+            self.writers[key].write_table(table)
+
+    def _write_excel(self, sheet_name, df):
+        if sheet_name not in self.worksheets:
+            self.worksheets[sheet_name] = self.workbook.create_sheet(sheet_name)
+            self.worksheets[sheet_name].append(list(df.columns))
+        worksheet = self.worksheets[sheet_name]
+        for row in df.astype(object).where(df.notna(), None).itertuples(index=False, name=None):
+            worksheet.append(row)
+
+    # Finish all files
+    def close(self):
+        """
+        :return: List of written paths
+        """
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+        if self.workbook is not None:
+            path = self.stem + '.xlsx'
+            self.workbook.save(path)
+            self.paths.append(path)
+            self.workbook = None
+        return self.paths
+
+
+# Read the sheets of a columnar output back
+def read_result_sheets(output_path, file_format='parquet'):
+    """
+    :param output_path: Output path given to ResultSink
+    :param file_format: 'parquet' or 'arrow'
+    :return: Dictionary {sheet name: DataFrame}, in file name order
+    """
+    stem = os.path.splitext(output_path)[0]
+    sheets = {}
+    for file_name in sorted(os.listdir(stem)):
+        sheet_name, extension = os.path.splitext(file_name)
+        if extension == f'.{file_format}':
+            path = os.path.join(stem, file_name)
+            sheets[sheet_name] = (pd.read_parquet(path) if file_format == 'parquet'
+                                  else pa.ipc.open_file(path).read_all().to_pandas())
+    return sheets
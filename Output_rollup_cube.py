@@ -0,0 +1,184 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Dimensions of the rollup cube of the scenario results, in axis order (the indicators form the last axis)
+ROLLUP_DIMENSIONS = ['Demand scenario', 'Variant', 'Scenario', 'Year', 'Province', 'Battery type']
+
+
+# Pre-aggregated indicator sums of the detailed simulation results
+class RollupCube:
+    """
+    Dense array of indicator sums with one labeled axis per dimension and the indicators as last axis, plus the
+    number of detailed rows of each cell (cells without rows are absent combinations, not zero results).
+    Rows are added in one pass per table (flat cell index, one np.bincount per indicator), so slices and totals
+    are label lookups and array indexing instead of scans of the detailed results.
+    """
+
+    def __init__(self, axes, indicators, values=None, counts=None):
+        """
+        :param axes: Dictionary {dimension: labels}, in axis order (labels may be empty and grow with add)
+        :param indicators: Indicator names (last axis)
+        :param values: Array of sums, shape (axes..., indicators); zeros if omitted
+        :param counts: Array of detailed row counts, shape (axes...); zeros if omitted
+        """
+        self.axes = {dimension: pd.Index(labels) for dimension, labels in axes.items()}
+        self.indicators = pd.Index(indicators)
+        shape = tuple(len(labels) for labels in self.axes.values())
+        self.values = np.zeros(shape + (len(self.indicators),)) if values is None else values
+        self.counts = np.zeros(shape, dtype=np.int64) if counts is None else counts
+        self.positions = {dimension: {label: position for position, label in enumerate(labels)}
+                          for dimension, labels in self.axes.items()}
+        self.positions[None] = {indicator: position for position, indicator in enumerate(self.indicators)}
+
+    @property
+    def dimensions(self):
+        return list(self.axes)
+
+    # Extend an axis by new labels (zero cells)
+    def _extend_axis(self, dimension, labels):
+        axis = self.dimensions.index(dimension)
+        self.axes[dimension] = self.axes[dimension].append(pd.Index(labels))
+        self.positions[dimension] = {label: position for position, label in enumerate(self.axes[dimension])}
+        for name in ['values', 'counts']:
+            array = getattr(self, name)
+            padding = [(0, 0)] * array.ndim
+            padding[axis] = (0, len(labels))
+            setattr(self, name, np.pad(array, padding))
+
+    # Add the rows of a detailed result table
+    def add(self, results_df):
+        """
+        :param results_df: Detailed results with the cube's dimension and indicator columns
+        :return: The cube
+        """
+        labels = {dimension: self._labels(results_df, dimension) for dimension in self.dimensions}
+        for dimension in self.dimensions:
+            values = pd.unique(labels[dimension])
+            new_labels = [label for label in values if label not in self.positions[dimension]]
+            if new_labels:
+                self._extend_axis(dimension, new_labels)
+
+        # Flat cell index of each row, then one weighted count per indicator
+        shape = self.counts.shape
+        codes = [self.axes[dimension].get_indexer(labels[dimension]) for dimension in self.axes]
+        cells = np.ravel_multi_index(codes, shape)
+        size = int(np.prod(shape))
+        self.counts += np.bincount(cells, minlength=size).reshape(shape)
+        data = results_df[list(self.indicators)].to_numpy(dtype=float)
+        flat_values = self.values.reshape(size, len(self.indicators))
+        for k in range(len(self.indicators)):
+            flat_values[:, k] += np.bincount(cells, weights=data[:, k], minlength=size)
+        return self
+
+    # Labels of a dimension column; years are integers whatever the dtype of the results (e.g. string years)
+    @staticmethod
+    def _labels(results_df, dimension):
+        labels = results_df[dimension]
+        if dimension == 'Year' and not pd.api.types.is_integer_dtype(labels):
+            labels = pd.to_numeric(labels.astype(str).str.strip()).astype(np.int64)
+        return labels.to_numpy()
+
+    # Slice of the cube by labels
+    def query(self, selection=None, indicator=None):
+        """
+        :param selection: Dictionary {dimension: label or list of labels}, with integer years; unselected
+                          dimensions are kept whole
+        :param indicator: Indicator name or list of names (None for all)
+        :return: Array over the list-selected and unselected dimensions (in axis order) and, unless one indicator
+                 is given, the indicators; a float for a fully selected cell
+        """
+        selection = dict(selection or {})
+        unknown = set(selection) - set(self.axes)
+        if unknown:
+            raise ValueError(f"Unknown rollup dimensions: {sorted(unknown)}")
+        selection[None] = indicator
+        index = []
+        taken = []
+        for dimension in self.dimensions + [None]:
+            labels = selection.get(dimension)
+            if labels is None:
+                index.append(slice(None))
+            elif isinstance(labels, (list, tuple, np.ndarray, pd.Index)):
+                index.append(slice(None))
+                taken.append((len(index) - 1, [self._position(dimension, label) for label in labels]))
+            else:
+                index.append(self._position(dimension, labels))
+
+        # Scalar labels index directly, label lists are taken along their (remaining) axis
+        result = self.values[tuple(index)]
+        for axis, positions in taken:
+            axis -= sum(isinstance(position, int) for position in index[:axis])
+            result = np.take(result, positions, axis=axis)
+        return result
+
+    def _position(self, dimension, label):
+        try:
+            return self.positions[dimension][label]
+        except KeyError:
+            raise ValueError(f"Unknown {dimension or 'indicator'} in the rollup cube: {label!r}") from None
+
+    # Totals over the other dimensions as a table
+    def to_frame(self, dimensions=None):
+        """
+        :param dimensions: Dimensions to keep (None for all)
+        :return: DataFrame indexed by the kept dimensions, one column per indicator, for the cells with rows
+        """
+        dimensions = self.dimensions if dimensions is None else list(dimensions)
+        axes = [self.dimensions.index(dimension) for dimension in dimensions]
+        summed = tuple(axis for axis in range(len(self.axes)) if axis not in axes)
+        permutation = [sorted(axes).index(axis) for axis in axes]
+        values = self.values.sum(axis=summed).transpose(permutation + [len(axes)])
+        counts = self.counts.sum(axis=summed).transpose(permutation)
+        if len(dimensions) == 1:
+            index = self.axes[dimensions[0]].rename(dimensions[0])
+        else:
+            index = pd.MultiIndex.from_product([self.axes[dimension] for dimension in dimensions], names=dimensions)
+        frame = pd.DataFrame(values.reshape(-1, len(self.indicators)), index=index, columns=self.indicators)
+        return frame[counts.reshape(-1) > 0]
+
+    # Save the cube as one .npz file
+    def save(self, path):
+        """
+        :param path: Output file, see rollup_cube_path
+        :return: path
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        axes = {f'axis_{i}': np.asarray(labels.tolist()) for i, labels in enumerate(self.axes.values())}
+        with open(path, 'wb') as file:
+            np.savez(file, values=self.values, counts=self.counts, dimensions=np.asarray(self.dimensions),
+                     indicators=np.asarray(self.indicators.tolist()), **axes)
+        return path
+
+
+# Build the rollup cube of a detailed result table
+def build_rollup_cube(results_df, indicators, dimensions=ROLLUP_DIMENSIONS):
+    """
+    :param results_df: Detailed results, e.g. of run_simulation_scenarios
+    :param indicators: Indicator columns to sum
+    :param dimensions: Dimension columns, in axis order
+    :return: RollupCube
+    """
+    return RollupCube({dimension: [] for dimension in dimensions}, indicators).add(results_df)
+
+
+# File of the rollup cube next to the detailed output
+def rollup_cube_path(output_path):
+    """
+    :param output_path: Output path given to ResultSink
+    :return: <stem>/Rollup cube.npz, beside the columnar result sheets
+    """
+    return os.path.join(os.path.splitext(output_path)[0], 'Rollup cube.npz')
+
+
+# Load a saved rollup cube
+def load_rollup_cube(path):
+    """
+    :param path: File written by RollupCube.save
+    :return: RollupCube
+    """
+    with np.load(path) as data:
+        dimensions = data['dimensions'].tolist()
+        axes = {dimension: data[f'axis_{i}'] for i, dimension in enumerate(dimensions)}
+        return RollupCube(axes, data['indicators'].tolist(), data['values'], data['counts'])
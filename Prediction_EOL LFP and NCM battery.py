@@ -0,0 +1,15 @@
+import numpy as np
+from Prediction_EOL_engine import build_battery_type_table, save_eol_results
+from Prediction_EOL_parameters import BATTERY_TYPE_OUTPUT_PATH, RANDOM_SEED
+
+# Seed of the battery parameter draws: RANDOM_SEED, or a fresh one that is logged so the table can be reproduced
+seed = RANDOM_SEED if RANDOM_SEED is not None else np.random.SeedSequence().entropy
+print(f"Seed of the battery parameter draws: {seed} (set RANDOM_SEED to this value to reproduce the table)")
+
+# Run all EOL scenarios for PEV and CEV and aggregate the battery models to LFP and NCM
+battery_type_df = build_battery_type_table(seed=seed)
+
+# Save the table (Parquet by default, Excel only if listed in EOL_OUTPUT_FORMATS)
+output_paths = save_eol_results(battery_type_df, BATTERY_TYPE_OUTPUT_PATH)
+
+print(f"LFP and NCM battery retirement data ({len(battery_type_df)} rows) saved to {', '.join(output_paths)}")
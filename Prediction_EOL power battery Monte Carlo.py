@@ -0,0 +1,30 @@
+import time
+
+import pandas as pd
+from Prediction_EOL_engine import run_eol_monte_carlo, save_eol_results
+from Prediction_EOL_parameters import MONTE_CARLO_OUTPUT_PATH, MONTE_CARLO_SAMPLES, MONTE_CARLO_SEED
+
+# Propagate N battery parameter samples through all scenarios and vehicle classes
+start = time.perf_counter()
+results = run_eol_monte_carlo(n_samples=MONTE_CARLO_SAMPLES, seed=MONTE_CARLO_SEED)
+print(f"{MONTE_CARLO_SAMPLES} Monte Carlo samples evaluated in {time.perf_counter() - start:.1f} s "
+      f"(seed {MONTE_CARLO_SEED})")
+
+# National totals and city-level statistics of every combination in one long table;
+# Region is 'National' for the national totals (which have no battery type) and the city otherwise
+frames = []
+for (scenario, vehicle_class), (city_df, national_df) in results.items():
+    frames.append(national_df.assign(Scenario=scenario, Vehicle=vehicle_class, Region='National'))
+    frames.append(city_df.rename(columns={'City': 'Region'}).assign(Scenario=scenario, Vehicle=vehicle_class))
+monte_carlo_df = pd.concat(frames, ignore_index=True)
+regions = ['National'] + [region for region in pd.unique(monte_carlo_df['Region']) if region != 'National']
+monte_carlo_df['Region'] = pd.Categorical(monte_carlo_df['Region'], categories=regions)
+for column in ['Scenario', 'Vehicle', 'Battery type']:
+    monte_carlo_df[column] = monte_carlo_df[column].astype('category')
+keys = ['Scenario', 'Vehicle', 'Region', 'Year', 'Battery type']
+monte_carlo_df = monte_carlo_df[keys + [column for column in monte_carlo_df if column not in keys]]
+
+# Save results (Parquet by default, Excel only if listed in EOL_OUTPUT_FORMATS)
+output_paths = save_eol_results(monte_carlo_df, MONTE_CARLO_OUTPUT_PATH, sheet_name='Monte Carlo')
+
+print(f"Monte Carlo uncertainty analysis completed. Results have been saved to {', '.join(output_paths)}")
@@ -0,0 +1,19 @@
+from Prediction_EOL_engine import load_eol_inputs, run_eol_scenarios, save_eol_results
+from Prediction_EOL_parameters import EOL_OUTPUT_PATHS, SCENARIOS, VEHICLE_CLASSES
+
+# All scenario × vehicle-class combinations (4 EOL scenarios × PEV/CEV)
+combinations = [(scenario, vehicle_class) for vehicle_class in VEHICLE_CLASSES for scenario in SCENARIOS]
+
+# Load predictions and TP proportions once for all combinations
+inputs = load_eol_inputs(combinations)
+
+# Calculate all combinations in one run, sharing sales tensors and Weibull CDF tables;
+# only cities whose predictions changed since the previous run are recomputed
+results = run_eol_scenarios(combinations, inputs, incremental=True)
+
+# Save each combination to its own file (Parquet by default, see EOL_OUTPUT_FORMATS)
+for (scenario, vehicle_class), results_df in results.items():
+    output_paths = save_eol_results(results_df, EOL_OUTPUT_PATHS[(scenario, vehicle_class)])
+    print(f"{scenario} scenario, {vehicle_class}: {len(results_df)} rows saved to {', '.join(output_paths)}")
+
+print("Retired battery calculation completed for all scenarios.")
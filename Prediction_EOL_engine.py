@@ -0,0 +1,706 @@
+import hashlib
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from Prediction_EOL_parameters import (
+    BASELINE_END_YEAR, BATTERY_TYPE_OF_CHEMISTRY, BATTERY_TYPES, CAPACITY_FACTOR_RANGE, ED_CAPACITY_FACTOR_RANGE, ED_ENERGY_DENSITY_GROWTH,
+    ED_WEIGHT_FACTOR_RANGE, EOL_OUTPUT_FORMATS, EOL_STATE_DIR, LE_ADJUSTMENT_FACTOR, MONTE_CARLO_PERCENTILES,
+    MONTE_CARLO_SAMPLES, RANDOM_SEED, SCENARIO_OVERRIDES, SCENARIOS, VEHICLE_CLASSES,
+)
+
+
+# Number of cities handed to the retirement kernel at once
+CITIES_PER_BLOCK = 128
+
+
+# Partition the predictions by city in a single pass
+def partition_by_city(passenger_data):
+    """
+    Sort the predictions once so that every city occupies a contiguous block of rows
+    :param passenger_data: DataFrame with a 'City' column
+    :return: Tuple of (sorted DataFrame, cities in order of first appearance, block offsets of length n_cities + 1)
+    """
+    city_codes, cities = pd.factorize(passenger_data['City'])
+    order = np.argsort(city_codes, kind='stable')
+    offsets = np.searchsorted(city_codes[order], np.arange(len(cities) + 1))
+    return passenger_data.iloc[order], list(cities), offsets
+
+
+# Iterate over contiguous blocks of cities
+def iter_city_blocks(passenger_data, cities_per_block=CITIES_PER_BLOCK):
+    """
+    Yield consecutive city blocks of the partitioned predictions without re-filtering the table
+    :param passenger_data: DataFrame with a 'City' column
+    :param cities_per_block: Maximum number of cities per block (None for a single block)
+    :return: Generator of (cities, DataFrame slice) tuples
+    """
+    sorted_data, cities, offsets = partition_by_city(passenger_data)
+    step = cities_per_block or max(len(cities), 1)
+    for start in range(0, len(cities), step):
+        stop = min(start + step, len(cities))
+        yield cities[start:stop], sorted_data.iloc[offsets[start]:offsets[stop]]
+
+
+# Pivot long-format predictions into a city × sales-year matrix
+def pivot_sales(passenger_data, value_column, sales_years=None):
+    """
+    Pivot vehicle sales predictions into a dense city × sales-year matrix
+    :param passenger_data: DataFrame with 'City', 'Year' and the sales column
+    :param value_column: Name of the sales column ('PEV_number' or 'CEV_number')
+    :param sales_years: Optional sorted sales years to use as columns (defaults to the years in the data)
+    :return: Tuple of (sales matrix, cities in order of first appearance, sorted sales years)
+    """
+    city_codes, cities = pd.factorize(passenger_data['City'])
+    data_years = passenger_data['Year'].to_numpy()
+    if sales_years is None:
+        sales_years, year_codes = np.unique(data_years, return_inverse=True)
+    else:
+        sales_years = np.asarray(sales_years)
+        year_codes = np.searchsorted(sales_years, data_years)
+
+    # Missing sales count as zero, duplicated (city, year) rows are summed
+    sales = np.zeros((len(cities), len(sales_years)))
+    np.add.at(sales, (city_codes, year_codes), np.nan_to_num(passenger_data[value_column].to_numpy(dtype=float)))
+    return sales, list(cities), sales_years
+
+
+# Closed-form Weibull CDF for integer ages, cached per (shape, scale, adjustment factor)
+@lru_cache(maxsize=None)
+def _weibull_cdf_row(shape, scale, adjustment_factor, max_age):
+    ages = np.arange(max_age + 1, dtype=float)
+    row = -np.expm1(-(ages / (scale * adjustment_factor)) ** shape)  # 1 - exp(-(t / λ) ** k)
+    row.setflags(write=False)
+    return row
+
+
+# Build the Weibull CDF lookup table
+def weibull_cdf_table(weibull_params, models, max_age, adjustment_factor=1.0):
+    """
+    Retirement probability for every battery model and integer age, shared by all EOL scenarios
+    :param weibull_params: Dictionary of {'shape', 'scale'} per battery model
+    :param models: Battery models, in output order
+    :param max_age: Largest vehicle age to tabulate
+    :param adjustment_factor: Lifetime (scale) adjustment, e.g. 1.1 in the LE scenario
+    :return: Read-only array of shape model × age (0..max_age)
+    """
+    return np.stack([
+        _weibull_cdf_row(weibull_params[model]['shape'], weibull_params[model]['scale'], adjustment_factor, max_age)
+        for model in models
+    ])
+
+
+# Build the Weibull retirement probability tensor
+def retirement_cdf_tensor(years, sales_years, models, weibull_params, adjustment_factors=None):
+    """
+    Build the lower-triangular retirement probability tensor for all battery models
+    :param years: Retirement years
+    :param sales_years: Sales years (columns of the sales matrix)
+    :param models: Battery models, in output order
+    :param weibull_params: Dictionary of {'shape', 'scale'} per battery model
+    :param adjustment_factors: Optional lifetime (scale) adjustment per retirement year
+    :return: Array of shape model × retirement year × sales year
+    """
+    age = np.subtract.outer(np.asarray(years), np.asarray(sales_years)).astype(int)
+    max_age = max(int(age.max()), 0)
+    if adjustment_factors is None:
+        adjustment_factors = np.ones(len(years))
+    adjustment_factors = np.asarray(adjustment_factors, dtype=float)
+
+    # Gather each retirement year from the table of its adjustment factor
+    cdf = np.empty((len(models),) + age.shape)
+    for factor in np.unique(adjustment_factors):
+        rows = adjustment_factors == factor
+        table = weibull_cdf_table(weibull_params, models, max_age, float(factor))
+        cdf[:, rows, :] = table[:, np.clip(age[rows], 0, None)]
+
+    # Vehicles do not retire in or before their sales year
+    cdf[:, age <= 0] = 0
+    return cdf
+
+
+# Contract sales with the retirement probabilities
+def calculate_retired_counts(sales, cdf, sales_proportion=None):
+    """
+    Number of retired vehicles per city, retirement year and battery model
+    :param sales: City × sales-year sales matrix
+    :param cdf: Model × retirement-year × sales-year tensor from retirement_cdf_tensor, optionally
+                stacked along a leading scenario axis
+    :param sales_proportion: Optional sales-year × model proportion matrix applied to each cohort
+    :return: Array of shape city × retirement year × model (scenario × city × year × model when stacked)
+    """
+    if sales_proportion is None:
+        return np.einsum('cs,...mys->...cym', sales, cdf)
+
+    # Cohort sales of every model: city × sales year × model
+    weighted_sales = sales[:, :, None] * sales_proportion
+    return np.einsum('csm,mys->cym', weighted_sales, cdf)
+
+
+# Sales-year × model proportion matrix
+def sales_proportion_matrix(vehicle_proportion, sales_years, models):
+    """
+    Model proportions of every sales year, used to split each sales cohort by battery model (TP scenario)
+    :param vehicle_proportion: Model proportions indexed by year
+    :param sales_years: Sales years (columns of the sales matrix)
+    :param models: Battery models, in output order
+    :return: Array of shape sales year × model
+    """
+    return vehicle_proportion.loc[list(sales_years), list(models)].to_numpy(dtype=float)
+
+
+# Expand per-model parameters to arrays
+def model_parameter_array(params, models, years):
+    """
+    Convert battery parameters to an array aligned with (year, model)
+    :param params: Dictionary per model, or DataFrame indexed by year with model columns
+    :param models: Battery models, in output order
+    :param years: Retirement years
+    :return: Array broadcastable to retirement year × model
+    """
+    if isinstance(params, pd.DataFrame):
+        return params.loc[years, list(models)].to_numpy(dtype=float)
+    return np.array([params[model] for model in models], dtype=float)
+
+
+# Load the TP model proportions
+def load_tp_proportion(path, baseline_proportion, years):
+    """
+    Merge baseline model proportions up to BASELINE_END_YEAR with the TP proportions after it
+    :param path: Workbook with the TP model proportions by year
+    :param baseline_proportion: Baseline (BS) model proportions indexed by year
+    :param years: Years to keep
+    :return: DataFrame of model proportions indexed by year
+    """
+    vehicle_proportion_data = pd.read_excel(path)
+    vehicle_proportion_data.set_index('Year', inplace=True)
+    for year in years:
+        if year <= BASELINE_END_YEAR:
+            vehicle_proportion_data.loc[year] = baseline_proportion.loc[year]
+    return vehicle_proportion_data.loc[years]
+
+
+# Load the inputs of all requested combinations once
+def load_eol_inputs(combinations):
+    """
+    Read each prediction table (and TP proportion workbook) once for all requested combinations
+    :param combinations: Iterable of (scenario, vehicle class) tuples
+    :return: Dictionary per vehicle class with 'predictions' and, when TP is requested, 'tp_proportion'
+    """
+    inputs = {}
+    for scenario, vehicle_class in combinations:
+        class_params = VEHICLE_CLASSES[vehicle_class]
+        if vehicle_class not in inputs:
+            predictions = pd.read_excel(class_params['predictions_path'])
+            predictions['Year'] = predictions['Year'].astype(int)
+            inputs[vehicle_class] = {'predictions': predictions}
+        if scenario == 'TP' and 'tp_proportion' not in inputs[vehicle_class]:
+            inputs[vehicle_class]['tp_proportion'] = load_tp_proportion(
+                class_params['tp_proportion_path'], class_params['vehicle_proportion'], class_params['years'])
+    return inputs
+
+
+# Collect the parameters of one scenario and vehicle class
+def scenario_parameters(scenario, vehicle_class, inputs):
+    params = dict(VEHICLE_CLASSES[vehicle_class])
+    params.update(SCENARIO_OVERRIDES.get((scenario, vehicle_class), {}))
+    if scenario == 'TP':
+        params['vehicle_proportion'] = inputs[vehicle_class]['tp_proportion']
+    return params
+
+
+# Lifetime (Weibull scale) adjustment per retirement year
+def scenario_adjustment_factors(scenario, years):
+    if scenario != 'LE':
+        return None
+    return [LE_ADJUSTMENT_FACTOR if year > BASELINE_END_YEAR else 1.0 for year in years]
+
+
+# Dynamically calculate energy density factor based on year
+def get_energy_density_factor(year, energy_density_growth=ED_ENERGY_DENSITY_GROWTH):
+    if year <= BASELINE_END_YEAR:
+        return 1
+    else:
+        return energy_density_growth ** (year - BASELINE_END_YEAR)
+
+
+# Energy density factors for several growth rates at once
+def energy_density_factor_array(years, energy_density_growth):
+    """
+    Vectorized get_energy_density_factor over years and growth rates
+    :param years: Retirement years
+    :param energy_density_growth: Yearly energy density growth, scalar or 1-D array of growth rates
+    :return: Array of shape year (scalar growth) or growth × year
+    """
+    exponents = np.clip(np.asarray(years) - BASELINE_END_YEAR, 0, None)
+    return np.power.outer(np.asarray(energy_density_growth, dtype=float), exponents)
+
+
+# Independent random stream of one scenario and vehicle class
+def scenario_rng(seed, scenario, vehicle_class):
+    """
+    Seeded generator keyed by the combination, so its draws do not depend on which other combinations run
+    :param seed: Integer seed (None for fresh OS entropy)
+    :param scenario: EOL scenario
+    :param vehicle_class: Vehicle class ('PEV' or 'CEV')
+    :return: numpy Generator
+    """
+    spawn_key = (SCENARIOS.index(scenario), list(VEHICLE_CLASSES).index(vehicle_class))
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=spawn_key))
+
+
+# Draw battery capacity (and ED weights) samples for one scenario
+def draw_battery_parameters(scenario, params, rng, n_samples=None, energy_density_growth=ED_ENERGY_DENSITY_GROWTH):
+    """
+    Draw the usable battery capacity of each model; the ED scenario draws capacity and weight per year after
+    the baseline. All samples are drawn at once as arrays.
+    :param scenario: EOL scenario ('BS', 'TP', 'ED' or 'LE')
+    :param params: Scenario parameters from scenario_parameters
+    :param rng: numpy Generator, e.g. from scenario_rng
+    :param n_samples: Number of samples (None for a single draw without the sample axis)
+    :param energy_density_growth: Yearly energy density growth of the ED scenario
+    :return: Tuple of (battery weights in kg, estimated battery capacity in kWh), each of shape
+             sample × year × model (year × model when n_samples is None)
+    """
+    years = np.asarray(params['years'])
+    models = list(params['vehicle_proportion'].columns)
+    size = 1 if n_samples is None else n_samples
+    battery_weights = model_parameter_array(params['battery_weights'], models, years)
+    nominal_capacity = model_parameter_array(params['nominal_capacity'], models, years)
+
+    # One usable-capacity share per sample and model, shared by all years
+    weights = np.broadcast_to(battery_weights, (size, len(years), len(models))).copy()
+    capacity = nominal_capacity * rng.uniform(*CAPACITY_FACTOR_RANGE, size=(size, 1, len(models)))
+    capacity = np.broadcast_to(capacity, weights.shape).copy()
+
+    # ED: narrower draws per year after the baseline, scaled by the energy density growth
+    if scenario == 'ED':
+        after = years > BASELINE_END_YEAR
+        draw_shape = (size, int(after.sum()), len(models))
+        energy_density_factors = energy_density_factor_array(years[after], energy_density_growth)
+        weights[:, after] = battery_weights * rng.uniform(*ED_WEIGHT_FACTOR_RANGE, size=draw_shape)
+        capacity[:, after] = (nominal_capacity * rng.uniform(*ED_CAPACITY_FACTOR_RANGE, size=draw_shape)
+                              * energy_density_factors[:, None])
+
+    if n_samples is None:
+        return weights[0], capacity[0]
+    return weights, capacity
+
+
+# Retired battery counts of scenario × vehicle-class combinations
+def calculate_scenario_counts(combinations, inputs, cities_per_block=CITIES_PER_BLOCK):
+    """
+    Retired battery counts per city, year and battery model, before weights and capacities are applied.
+    Each vehicle class pivots its sales once; the CDF tensors of its scenarios are stacked along a
+    scenario axis and contracted with every block of cities in a single einsum.
+    :param combinations: List of (scenario, vehicle class) tuples
+    :param inputs: Inputs from load_eol_inputs
+    :param cities_per_block: Number of cities per kernel call (None for all cities at once)
+    :return: Dictionary {(scenario, vehicle class): (cities, years, models, city × year × model counts, parameters)}
+    """
+    results = {}
+    for vehicle_class in dict.fromkeys(vehicle_class for _, vehicle_class in combinations):
+        scenarios = [scenario for scenario, other in combinations if other == vehicle_class]
+        predictions = inputs[vehicle_class]['predictions']
+        value_column = VEHICLE_CLASSES[vehicle_class]['value_column']
+        params = {scenario: scenario_parameters(scenario, vehicle_class, inputs) for scenario in scenarios}
+
+        # Shared axes: sales years of the predictions and the union of all retirement years
+        sales_years = np.unique(predictions['Year'].to_numpy())
+        years = sorted(set().union(*(params[scenario]['years'] for scenario in scenarios)))
+
+        # Stack the CDF tensors of all scenarios that apply retirement-year proportions
+        stacked = [scenario for scenario in scenarios if scenario != 'TP']
+        cdf = {
+            scenario: retirement_cdf_tensor(years, sales_years, list(params[scenario]['vehicle_proportion'].columns),
+                                            params[scenario]['weibull_params'],
+                                            scenario_adjustment_factors(scenario, years))
+            for scenario in scenarios
+        }
+        stacked_cdf = np.stack([cdf[scenario] for scenario in stacked]) if stacked else None
+
+        # TP splits each sales cohort by the model proportions of its sales year
+        if 'TP' in scenarios:
+            vehicle_proportion = params['TP']['vehicle_proportion']
+            sales_proportion = sales_proportion_matrix(vehicle_proportion, sales_years, vehicle_proportion.columns)
+
+        cities, counts = [], {scenario: [] for scenario in scenarios}
+        for block_cities, block_data in iter_city_blocks(predictions, cities_per_block):
+            sales, _, _ = pivot_sales(block_data, value_column, sales_years)
+            cities.extend(block_cities)
+            if stacked:
+                for scenario, block_counts in zip(stacked, calculate_retired_counts(sales, stacked_cdf)):
+                    counts[scenario].append(block_counts)
+            if 'TP' in scenarios:
+                counts['TP'].append(calculate_retired_counts(sales, cdf['TP'], sales_proportion))
+
+        for scenario in scenarios:
+            scenario_years = params[scenario]['years']
+            vehicle_proportion = params[scenario]['vehicle_proportion']
+            models = list(vehicle_proportion.columns)
+            retired_battery_count = np.concatenate(counts[scenario])[:, np.searchsorted(years, scenario_years)]
+            if scenario != 'TP':
+                retired_battery_count = retired_battery_count * vehicle_proportion.loc[scenario_years, models].to_numpy()
+            results[(scenario, vehicle_class)] = (cities, scenario_years, models, retired_battery_count, params[scenario])
+
+    return results
+
+
+# Retired counts of one combination for a sales matrix
+def retired_counts_for_sales(scenario, params, sales, sales_years, years, cities_per_block=CITIES_PER_BLOCK):
+    """
+    Retired battery counts of one scenario for a city × sales-year matrix, after the model proportions
+    :param scenario: EOL scenario
+    :param params: Scenario parameters from scenario_parameters
+    :param sales: City × sales-year sales matrix
+    :param sales_years: Sales years (columns of the sales matrix)
+    :param years: Retirement years to evaluate (any subset of the scenario years)
+    :param cities_per_block: Number of cities per kernel call (None for all cities at once)
+    :return: Array of shape city × year × model
+    """
+    vehicle_proportion = params['vehicle_proportion']
+    models = list(vehicle_proportion.columns)
+    cdf = retirement_cdf_tensor(years, sales_years, models, params['weibull_params'],
+                                scenario_adjustment_factors(scenario, years))
+    sales_proportion = sales_proportion_matrix(vehicle_proportion, sales_years, models) if scenario == 'TP' else None
+
+    step = cities_per_block or max(len(sales), 1)
+    counts = np.concatenate([
+        calculate_retired_counts(sales[start:start + step], cdf, sales_proportion)
+        for start in range(0, len(sales), step)
+    ]) if len(sales) else np.zeros((0, len(years), len(models)))
+    if scenario != 'TP':
+        counts = counts * vehicle_proportion.loc[years, models].to_numpy()
+    return counts
+
+
+# Fingerprint of everything besides sales that the retired counts depend on
+def scenario_fingerprint(scenario, params):
+    vehicle_proportion = params['vehicle_proportion']
+    digest = hashlib.sha256(repr((
+        scenario, list(params['years']), list(vehicle_proportion.columns), sorted(params['weibull_params'].items()),
+        scenario_adjustment_factors(scenario, params['years']),
+    )).encode())
+    digest.update(np.ascontiguousarray(vehicle_proportion.to_numpy(dtype=float)).tobytes())
+    digest.update(np.asarray(vehicle_proportion.index, dtype=np.int64).tobytes())
+    return digest.hexdigest()
+
+
+# Load the saved sales and counts of one combination
+def load_eol_state(path, fingerprint, sales_years):
+    """
+    Read the state saved by update_scenario_counts
+    :return: Dictionary with 'cities', 'sales' and 'counts', or None when missing or computed from other parameters
+    """
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as state:
+        if str(state['fingerprint']) != fingerprint or not np.array_equal(state['sales_years'], sales_years):
+            return None
+        return {'cities': state['cities'].tolist(), 'sales': state['sales'], 'counts': state['counts']}
+
+
+# Incremental variant of calculate_scenario_counts
+def update_scenario_counts(combinations, inputs, cities_per_block=CITIES_PER_BLOCK, state_dir=EOL_STATE_DIR):
+    """
+    Update the retired counts saved by the previous run instead of recomputing every city.
+    Retirement is linear in sales and a vehicle sold in year s only retires in years after s, so the
+    counts change by the retired counts of the sales difference. Only the cities whose sales changed
+    (or which are new) are evaluated, and only for sales and retirement years from their first change.
+    Without a compatible saved state (missing, other parameters or other sales years) all cities are computed.
+    :param combinations: List of (scenario, vehicle class) tuples
+    :param inputs: Inputs from load_eol_inputs
+    :param cities_per_block: Number of cities per kernel call (None for all cities at once)
+    :param state_dir: Directory of the saved sales matrices and count cubes (one .npz per combination)
+    :return: Same dictionary as calculate_scenario_counts
+    """
+    os.makedirs(state_dir, exist_ok=True)
+    results = {}
+    for scenario, vehicle_class in combinations:
+        params = scenario_parameters(scenario, vehicle_class, inputs)
+        value_column = VEHICLE_CLASSES[vehicle_class]['value_column']
+        sales, cities, sales_years = pivot_sales(inputs[vehicle_class]['predictions'], value_column)
+        years = np.asarray(params['years'])
+        models = list(params['vehicle_proportion'].columns)
+        fingerprint = scenario_fingerprint(scenario, params)
+        state_path = os.path.join(state_dir, f'{scenario}_{vehicle_class}_EOL_state.npz')
+
+        state = load_eol_state(state_path, fingerprint, sales_years)
+        if state is None:
+            counts = retired_counts_for_sales(scenario, params, sales, sales_years, years, cities_per_block)
+        else:
+            # Align the previous state with the current cities; new cities start from zero sales
+            previous_rows = dict(zip(state['cities'], range(len(state['cities']))))
+            rows = np.array([previous_rows.get(city, -1) for city in cities], dtype=int)
+            known = rows >= 0
+            previous_sales = np.zeros_like(sales)
+            previous_sales[known] = state['sales'][rows[known]]
+            counts = np.zeros((len(cities), len(years), len(models)))
+            counts[known] = state['counts'][rows[known]]
+
+            # Add the retired counts of the sales difference from the first changed sales year on
+            delta = sales - previous_sales
+            changed = np.flatnonzero((delta != 0).any(axis=1))
+            if changed.size:
+                first_sales = int((delta[changed] != 0).argmax(axis=1).min())
+                first_year = int(np.searchsorted(years, sales_years[first_sales]))
+                counts[changed, first_year:] += retired_counts_for_sales(
+                    scenario, params, delta[changed, first_sales:], sales_years[first_sales:], years[first_year:],
+                    cities_per_block)
+
+        np.savez_compressed(state_path, cities=np.asarray(cities, dtype=str), sales=sales, sales_years=sales_years,
+                            counts=counts, fingerprint=np.asarray(fingerprint))
+        results[(scenario, vehicle_class)] = (cities, params['years'], models, counts, params)
+
+    return results
+
+
+# Run scenario × vehicle-class combinations in one process
+def run_eol_scenarios(combinations=None, inputs=None, cities_per_block=CITIES_PER_BLOCK, seed=RANDOM_SEED,
+                      incremental=False):
+    """
+    Calculate retired battery weight and capacity for several EOL scenarios and vehicle classes at once
+    :param combinations: List of (scenario, vehicle class) tuples (defaults to all 8 combinations)
+    :param inputs: Inputs from load_eol_inputs (loaded here when omitted)
+    :param cities_per_block: Number of cities per kernel call (None for all cities at once)
+    :param seed: Seed of the battery parameter draws (None for a fresh draw on every run)
+    :param incremental: Update the counts saved in EOL_STATE_DIR by the previous run (see update_scenario_counts)
+    :return: Dictionary {(scenario, vehicle class): results DataFrame}, in the order of combinations
+    """
+    if combinations is None:
+        combinations = [(scenario, vehicle_class) for vehicle_class in VEHICLE_CLASSES for scenario in SCENARIOS]
+    if inputs is None:
+        inputs = load_eol_inputs(combinations)
+
+    results = {}
+    count_function = update_scenario_counts if incremental else calculate_scenario_counts
+    counts = count_function(combinations, inputs, cities_per_block)
+    for (scenario, vehicle_class), (cities, years, models, retired_battery_count, params) in counts.items():
+        weights, capacities = draw_battery_parameters(scenario, params, scenario_rng(seed, scenario, vehicle_class))
+        results[(scenario, vehicle_class)] = results_frame(
+            cities, years, models,
+            retired_battery_count * weights / 1e6,  # Convert kg to thousand tons
+            retired_battery_count * capacities / 1e6,  # Convert kWh to GWh
+        )
+
+    return {combination: results[combination] for combination in combinations}
+
+
+# Energy density sensitivity of the ED scenario
+def run_ed_sensitivity(vehicle_class, energy_density_growth, inputs=None, seed=RANDOM_SEED,
+                       cities_per_block=CITIES_PER_BLOCK):
+    """
+    Evaluate the ED scenario for many energy density growth rates at once. The retired counts and the
+    battery parameter draws are shared by all growth rates; capacity after the baseline scales with
+    growth ** (year - BASELINE_END_YEAR), which is broadcast along a leading factor axis.
+    :param vehicle_class: Vehicle class ('PEV' or 'CEV')
+    :param energy_density_growth: Growth rates to evaluate, e.g. np.arange(1.00, 1.1005, 0.001)
+    :param inputs: Inputs from load_eol_inputs (loaded here when omitted)
+    :param seed: Seed of the battery parameter draws (None for a fresh draw on every run)
+    :param cities_per_block: Number of cities per kernel call (None for all cities at once)
+    :return: DataFrame with 'Energy Density Factor' followed by the EOL output columns, one block per factor
+    """
+    combination = ('ED', vehicle_class)
+    if inputs is None:
+        inputs = load_eol_inputs([combination])
+    energy_density_growth = np.atleast_1d(np.asarray(energy_density_growth, dtype=float))
+
+    cities, years, models, retired_battery_count, params = calculate_scenario_counts(
+        [combination], inputs, cities_per_block)[combination]
+    weights, capacities = draw_battery_parameters('ED', params, scenario_rng(seed, *combination),
+                                                  energy_density_growth=1.0)
+
+    # Weight does not depend on the factor; capacity gains a factor axis
+    retired_battery_weight = retired_battery_count * weights / 1e6  # Convert kg to thousand tons
+    retired_battery_capacity = ((retired_battery_count * capacities / 1e6)[None]  # Convert kWh to GWh
+                                * energy_density_factor_array(years, energy_density_growth)[:, None, :, None])
+
+    keys = result_keys(cities, years, models)
+    n_factors, n_rows = len(energy_density_growth), len(keys)
+    results = keys.iloc[np.tile(np.arange(n_rows), n_factors)].reset_index(drop=True)
+    results.insert(0, 'Energy Density Factor', np.repeat(energy_density_growth, n_rows))
+    results['Weight (thousand t)'] = np.tile(retired_battery_weight.ravel(), n_factors)
+    results['Capacity (GWh)'] = retired_battery_capacity.ravel()
+    return results
+
+
+# Summary statistics over the sample axis
+def sample_statistics(samples, percentiles=MONTE_CARLO_PERCENTILES):
+    """
+    Mean and percentiles over the leading sample axis
+    :param samples: Array of shape sample × ...
+    :param percentiles: Percentiles to report, e.g. (5, 50, 95)
+    :return: Dictionary {'mean' or 'P<q>': array without the sample axis}
+    """
+    statistics = {'mean': samples.mean(axis=0)}
+    for percentile, values in zip(percentiles, np.percentile(samples, percentiles, axis=0)):
+        statistics[f'P{percentile:g}'] = values
+    return statistics
+
+
+# Monte Carlo uncertainty of the retired battery weight and capacity
+def run_eol_monte_carlo(combinations=None, inputs=None, n_samples=MONTE_CARLO_SAMPLES, seed=RANDOM_SEED,
+                        percentiles=MONTE_CARLO_PERCENTILES, cities_per_block=CITIES_PER_BLOCK):
+    """
+    Propagate the battery parameter draws through the retirement model for N samples at once.
+    The retired counts do not depend on the draws and are computed once; every (city, year, model) cell is
+    a non-negative count times one sampled parameter, so its mean and percentiles are the count times those
+    of the parameter samples. National totals are evaluated for every sample in one einsum.
+    :param combinations: List of (scenario, vehicle class) tuples (defaults to all 8 combinations)
+    :param inputs: Inputs from load_eol_inputs (loaded here when omitted)
+    :param n_samples: Number of Monte Carlo samples
+    :param seed: Seed of the parameter draws (None for fresh OS entropy)
+    :param percentiles: Percentiles to report
+    :param cities_per_block: Number of cities per kernel call (None for all cities at once)
+    :return: Dictionary {(scenario, vehicle class): (city summary DataFrame, national summary DataFrame)}
+    """
+    if combinations is None:
+        combinations = [(scenario, vehicle_class) for vehicle_class in VEHICLE_CLASSES for scenario in SCENARIOS]
+    if inputs is None:
+        inputs = load_eol_inputs(combinations)
+
+    results = {}
+    counts = calculate_scenario_counts(combinations, inputs, cities_per_block)
+    for (scenario, vehicle_class), (cities, years, models, retired_battery_count, params) in counts.items():
+        rng = scenario_rng(seed, scenario, vehicle_class)
+        weights, capacities = draw_battery_parameters(scenario, params, rng, n_samples)
+        national_count = retired_battery_count.sum(axis=0)
+
+        city_summary = result_keys(cities, years, models)
+        national_summary = pd.DataFrame({'Year': np.asarray(years)})
+        for name, samples in (('Weight (thousand t)', weights), ('Capacity (GWh)', capacities)):
+            for statistic, values in sample_statistics(samples / 1e6, percentiles).items():
+                city_summary[f'{name} {statistic}'] = (retired_battery_count * values).ravel()
+            national_samples = np.einsum('ym,nym->ny', national_count, samples / 1e6)
+            for statistic, values in sample_statistics(national_samples, percentiles).items():
+                national_summary[f'{name} {statistic}'] = values
+        results[(scenario, vehicle_class)] = (city_summary, national_summary)
+
+    return {combination: results[combination] for combination in combinations}
+
+
+# Province of every city, from the prediction tables
+def city_provinces(inputs):
+    """
+    :param inputs: Inputs from load_eol_inputs
+    :return: Series of provinces (as in the predictions, including trailing spaces) indexed by city
+    """
+    predictions = pd.concat([inputs[vehicle_class]['predictions'][['City', 'Province']] for vehicle_class in inputs])
+    return predictions.drop_duplicates('City').set_index('City')['Province']
+
+
+# Aggregate the battery models of all EOL results to the simulation battery types
+def aggregate_battery_types(results, inputs):
+    """
+    Sum PEV and CEV results per scenario, map the battery models to LFP/NCM and attach the province of each city.
+    This is the 'EOL LFP and NCM battery' table read by the Simulation scripts.
+    :param results: Dictionary {(scenario, vehicle class): results DataFrame} from run_eol_scenarios
+    :param inputs: Inputs from load_eol_inputs (for the provinces of the cities)
+    :return: DataFrame with 'Year', 'Province', 'City', 'Scenario', 'Battery type', 'Weight (thousand t)' and
+             'Capacity (GWh)', sorted by province, city, year, scenario (in SCENARIOS order) and battery type
+    """
+    # Output axes: cities sorted by province and name, all years and the scenarios present in the results
+    provinces = city_provinces(inputs)
+    city_table = provinces.reset_index().sort_values(['Province', 'City'], kind='stable')
+    city_index = pd.Index(city_table['City'])
+    years = np.unique(np.concatenate([results_df['Year'].to_numpy() for results_df in results.values()]))
+    scenarios = [scenario for scenario in SCENARIOS if any(other == scenario for other, _ in results)]
+
+    # Scatter-add every result row into a city × year × scenario × battery type cube
+    weight = np.zeros((len(city_index), len(years), len(scenarios), len(BATTERY_TYPES)))
+    capacity = np.zeros_like(weight)
+    for (scenario, _), results_df in results.items():
+        city_codes = city_index.get_indexer(results_df['City'])
+        if (city_codes < 0).any():
+            missing = pd.unique(results_df['City'].to_numpy()[city_codes < 0])
+            raise ValueError(f"No province found for cities: {list(missing)}")
+        models = pd.Categorical(results_df['Battery type'])
+        model_types = np.array([BATTERY_TYPES.index(BATTERY_TYPE_OF_CHEMISTRY[model.split('_', 1)[1]])
+                                for model in models.categories])
+        cells = (city_codes, np.searchsorted(years, results_df['Year'].to_numpy()), scenarios.index(scenario),
+                 model_types[models.codes])
+        np.add.at(weight, cells, results_df['Weight (thousand t)'].to_numpy())
+        np.add.at(capacity, cells, results_df['Capacity (GWh)'].to_numpy())
+
+    n_cities, n_years, n_scenarios, n_types = weight.shape
+    return pd.DataFrame({
+        'Year': np.tile(np.repeat(years, n_scenarios * n_types), n_cities),
+        'Province': np.repeat(city_table['Province'].to_numpy(dtype=object), n_years * n_scenarios * n_types),
+        'City': np.repeat(city_index.to_numpy(dtype=object), n_years * n_scenarios * n_types),
+        'Scenario': np.tile(np.repeat(np.asarray(scenarios, dtype=object), n_types), n_cities * n_years),
+        'Battery type': np.tile(np.asarray(BATTERY_TYPES, dtype=object), n_cities * n_years * n_scenarios),
+        'Weight (thousand t)': weight.ravel(),
+        'Capacity (GWh)': capacity.ravel(),
+    })
+
+
+# Build the simulation input from the EOL engine in memory
+def build_battery_type_table(seed=RANDOM_SEED, inputs=None):
+    """
+    Run all EOL scenarios for PEV and CEV and aggregate them to the simulation input table
+    :param seed: Seed of the battery parameter draws (None for a fresh draw on every run)
+    :param inputs: Inputs from load_eol_inputs (loaded here when omitted)
+    :return: DataFrame as from aggregate_battery_types
+    """
+    combinations = [(scenario, vehicle_class) for vehicle_class in VEHICLE_CLASSES for scenario in SCENARIOS]
+    if inputs is None:
+        inputs = load_eol_inputs(combinations)
+    return aggregate_battery_types(run_eol_scenarios(combinations, inputs, seed=seed), inputs)
+
+
+# Key columns of the long output table
+def result_keys(cities, years, models):
+    """
+    City, year and battery model of every cell of a city × year × model cube, in row-major order
+    :return: DataFrame with categorical 'City' and 'Battery type' and int16 'Year'
+    """
+    models = list(models)
+    n_cities, n_years, n_models = len(cities), len(years), len(models)
+    return pd.DataFrame({
+        'City': pd.Categorical.from_codes(np.repeat(np.arange(n_cities), n_years * n_models), categories=list(cities)),
+        'Year': np.tile(np.repeat(np.asarray(years, dtype=np.int16), n_models), n_cities),
+        'Battery type': pd.Categorical.from_codes(np.tile(np.arange(n_models), n_cities * n_years), categories=models),
+    })
+
+
+# Write an EOL results table in the configured formats
+def save_eol_results(results_df, output_path, formats=EOL_OUTPUT_FORMATS, sheet_name='Sheet1'):
+    """
+    Write the results next to output_path, once per format; the extension of output_path is replaced
+    :param results_df: Results table, e.g. from run_eol_scenarios
+    :param output_path: Output path, e.g. from EOL_OUTPUT_PATHS
+    :param formats: Any of 'parquet', 'feather' and 'excel'
+    :param sheet_name: Worksheet name of the Excel export
+    :return: List of written paths
+    """
+    stem = os.path.splitext(output_path)[0]
+    os.makedirs(os.path.dirname(stem) or '.', exist_ok=True)
+    written = []
+    for file_format in formats:
+        if file_format == 'parquet':
+            path = stem + '.parquet'
+            results_df.to_parquet(path, index=False)
+        elif file_format == 'feather':
+            path = stem + '.feather'
+            results_df.reset_index(drop=True).to_feather(path)
+        elif file_format == 'excel':
+            path = stem + '.xlsx'
+            results_df.to_excel(path, sheet_name=sheet_name, index=False)
+        else:
+            raise ValueError(f"Unknown output format: {file_format}")
+        written.append(path)
+    return written
+
+
+# Flatten result cubes into the long output table
+def results_frame(cities, years, models, retired_battery_weight, retired_battery_capacity):
+    """
+    Build the EOL output table (one row per city, year and battery model)
+    :return: DataFrame with 'City', 'Year', 'Battery type', 'Weight (thousand t)' and 'Capacity (GWh)'
+    """
+    results = result_keys(cities, years, models)
+    results['Weight (thousand t)'] = retired_battery_weight.ravel()
+    results['Capacity (GWh)'] = retired_battery_capacity.ravel()
+    return results
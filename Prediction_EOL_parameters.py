@@ -0,0 +1,354 @@
+import pandas as pd
+
+# Prediction results and TP model proportions of each vehicle class (relative paths)
+PEV_PREDICTIONS_PATH = './output data_prediction/PEV_Predictions_results.xlsx'
+CEV_PREDICTIONS_PATH = './output data_prediction/CEV_Predictions_results.xlsx'
+PEV_TP_PROPORTION_PATH = './input data/Changes in the proportion of PEV type.xlsx'
+CEV_TP_PROPORTION_PATH = './input data/Changes in the proportion of CEV type.xlsx'
+
+# Retirement years of each vehicle class
+PEV_YEARS = list(range(2016, 2031))
+CEV_YEARS = list(range(2017, 2031))
+
+# Last year of the baseline; scenario measures (TP, ED, LE) apply from the year after
+BASELINE_END_YEAR = 2023
+
+# Vehicle proportion by year (12 models, sum to 1)
+PEV_VEHICLE_PROPORTION = pd.DataFrame({
+    'BPEV_LFP': [
+        0.543065476, 0.355647668, 0.29184876, 0.251713961, 0.288924559,
+        0.4394, 0.49042, 0.49781, 0.49781, 0.49781, 0.49781, 0.49781, 0.49781, 0.49781, 0.49781
+    ],
+    'BPEV_NCM111': [
+        0.028836012, 0.054317098, 0.036518511, 0.016046765, 0.020545746,
+        0.006929, 0, 0, 0, 0, 0, 0, 0, 0, 0
+    ],
+    'BPEV_NCM523': [
+        0.168579762, 0.33495544, 0.301277719, 0.336982066, 0.27223114,
+        0.174408, 0.0791, 0.03715, 0.03715, 0.03715, 0.03715, 0.03715, 0.03715, 0.03715, 0.03715
+    ],
+    'BPEV_NCM622': [
+        0.022181548, 0.058843523, 0.082166651, 0.101629512, 0.102728732,
+        0.068952, 0.07119, 0.05944, 0.05944, 0.05944, 0.05944, 0.05944, 0.05944, 0.05944, 0.05944
+    ],
+    'BPEV_NCM811': [
+        0.001109077, 0.002263212, 0.018259256, 0.058838138, 0.113001605,
+        0.146016, 0.14238, 0.14117, 0.14117, 0.14117, 0.14117, 0.14117, 0.14117, 0.14117, 0.14117
+    ],
+    'BPEV_NCA': [
+        0.001109077, 0.002263212, 0.018259256, 0.021395687, 0.005136437,
+        0.009295, 0.00791, 0.00743, 0.00743, 0.00743, 0.00743, 0.00743, 0.00743, 0.00743, 0.00743
+    ],
+    'HPEV_LFP': [
+        0.166934524, 0.084352332, 0.09815124, 0.068286039, 0.071075441,
+        0.0806, 0.12958, 0.17219, 0.17219, 0.17219, 0.17219, 0.17219, 0.17219, 0.17219, 0.17219
+    ],
+    'HPEV_NCM111': [
+        0.008863988, 0.012882902, 0.012281489, 0.004353235, 0.005054254,
+        0.001271, 0, 0, 0, 0, 0, 0, 0, 0, 0
+    ],
+    'HPEV_NCM523': [
+        0.051820238, 0.07944456, 0.101322281, 0.091417934, 0.06696886,
+        0.031992, 0.0209, 0.01285, 0.01285, 0.01285, 0.01285, 0.01285, 0.01285, 0.01285, 0.01285
+    ],
+    'HPEV_NCM622': [
+        0.006818452, 0.013956477, 0.027633349, 0.027570488, 0.025271268,
+        0.012648, 0.01881, 0.02056, 0.02056, 0.02056, 0.02056, 0.02056, 0.02056, 0.02056, 0.02056
+    ],
+    'HPEV_NCM811': [
+        0.000340923, 0.000536788, 0.006140744, 0.015961862, 0.027798395,
+        0.026784, 0.03762, 0.04883, 0.04883, 0.04883, 0.04883, 0.04883, 0.04883, 0.04883, 0.04883
+    ],
+    'HPEV_NCA': [
+        0.000340923, 0.000536788, 0.006140744, 0.005804313, 0.001263563,
+        0.001705, 0.00209, 0.00257, 0.00257, 0.00257, 0.00257, 0.00257, 0.00257, 0.00257, 0.00257
+    ]
+}, index=PEV_YEARS)
+
+CEV_VEHICLE_PROPORTION = pd.DataFrame({
+    'BCEV_LFP': [
+        0.410943396, 0.376493506, 0.306554622, 0.345123967,
+        0.508817204, 0.607159763, 0.6566, 0.6566, 0.6566, 0.6566, 0.6566, 0.6566, 0.6566, 0.6566
+    ],
+    'BCEV_NCM111': [
+        0.062762264, 0.047109957, 0.019542857, 0.024542149,
+        0.008023656, 0, 0, 0, 0, 0, 0, 0, 0, 0
+    ],
+    'BCEV_NCM523': [
+        0.387033962, 0.388657143, 0.4104, 0.325183471,
+        0.20196129, 0.097928994, 0.049, 0.049, 0.049, 0.049, 0.049, 0.049, 0.049, 0.049
+    ],
+    'BCEV_NCM622': [
+        0.067992453, 0.105997403, 0.123771429, 0.122710744,
+        0.079845161, 0.088136095, 0.0784, 0.0784, 0.0784, 0.0784, 0.0784, 0.0784, 0.0784, 0.0784
+    ],
+    'BCEV_NCM811': [
+        0.002615094, 0.023554978, 0.071657143, 0.134981818,
+        0.169083871, 0.176272189, 0.1862, 0.1862, 0.1862, 0.1862, 0.1862, 0.1862, 0.1862, 0.1862
+    ],
+    'BCEV_NCA': [
+        0.002615094, 0.023554978, 0.026057143, 0.006135537,
+        0.010763441, 0.009792899, 0.0098, 0.0098, 0.0098, 0.0098, 0.0098, 0.0098, 0.0098, 0.0098
+    ],
+    'HCEV_LFP': [
+        0.029056604,
+        0.013506494,
+        0.013445378,
+        0.014876033,
+        0.011182796,
+        0.012840237,
+        0.0134,
+        0.0134,
+        0.0134,
+        0.0134,
+        0.0134,
+        0.0134,
+        0.0134,
+        0.0134
+    ],
+    'HCEV_NCM111': [
+        0.004437736,
+        0.001690043,
+        0.000857143,
+        0.001057851,
+        0.000176344,
+        0,
+        0,
+        0,
+        0,
+        0,
+        0,
+        0,
+        0,
+        0
+    ],
+    'HCEV_NCM523': [
+        0.027366038,
+        0.013942857,
+        0.018,
+        0.014016529,
+        0.00443871,
+        0.002071006,
+        0.001,
+        0.001,
+        0.001,
+        0.001,
+        0.001,
+        0.001,
+        0.001,
+        0.001
+    ],
+    'HCEV_NCM622': [
+        0.004807547,
+        0.003802597,
+        0.005428571,
+        0.005289256,
+        0.001754839,
+        0.001863905,
+        0.0016,
+        0.0016,
+        0.0016,
+        0.0016,
+        0.0016,
+        0.0016,
+        0.0016,
+        0.0016
+    ],
+    'HCEV_NCM811': [
+        0.000184906,
+        0.000845022,
+        0.003142857,
+        0.005818182,
+        0.003716129,
+        0.003727811,
+        0.0038,
+        0.0038,
+        0.0038,
+        0.0038,
+        0.0038,
+        0.0038,
+        0.0038,
+        0.0038
+    ],
+    'HCEV_NCA': [
+        0.000184906,
+        0.000845022,
+        0.001142857,
+        0.000264463,
+        0.000236559,
+        0.000207101,
+        0.0002,
+        0.0002,
+        0.0002,
+        0.0002,
+        0.0002,
+        0.0002,
+        0.0002,
+        0.0002
+    ]
+}, index=CEV_YEARS)
+
+# Weibull lifetime distribution of each battery model
+PEV_WEIBULL_PARAMS = {
+    'BPEV_LFP': {'shape': 3.5, 'scale': 9},
+    'BPEV_NCM111': {'shape': 3.5, 'scale': 8},
+    'BPEV_NCM523': {'shape': 3.5, 'scale': 9},
+    'BPEV_NCM622': {'shape': 3.5, 'scale': 10},
+    'BPEV_NCM811': {'shape': 3.5, 'scale': 10.5},
+    'BPEV_NCA': {'shape': 3.5, 'scale': 11},
+    'HPEV_LFP': {'shape': 3.5, 'scale': 10.5},
+    'HPEV_NCM111': {'shape': 3.5, 'scale': 9.5},
+    'HPEV_NCM523': {'shape': 3.5, 'scale': 10.5},
+    'HPEV_NCM622': {'shape': 3.5, 'scale': 11.5},
+    'HPEV_NCM811': {'shape': 3.5, 'scale': 12},
+    'HPEV_NCA': {'shape': 3.5, 'scale': 12.5},
+}
+
+CEV_WEIBULL_PARAMS = {
+    'BCEV_LFP': {'shape': 3.5, 'scale': 6.5},
+    'BCEV_NCM111': {'shape': 3.5, 'scale': 5.5},
+    'BCEV_NCM523': {'shape': 3.5, 'scale': 5.5},
+    'BCEV_NCM622': {'shape': 3.5, 'scale': 6},
+    'BCEV_NCM811': {'shape': 3.5, 'scale': 6.5},
+    'BCEV_NCA': {'shape': 3.5, 'scale': 7},
+    'HCEV_LFP': {'shape': 3.5, 'scale': 6.8},
+    'HCEV_NCM111': {'shape': 3.5, 'scale': 7},
+    'HCEV_NCM523': {'shape': 3.5, 'scale': 7},
+    'HCEV_NCM622': {'shape': 3.5, 'scale': 7.5},
+    'HCEV_NCM811': {'shape': 3.5, 'scale': 8},
+    'HCEV_NCA': {'shape': 3.5, 'scale': 8.5},
+}
+
+# Battery weight ranges (kg, based on average)
+PEV_BATTERY_WEIGHTS = {
+    "BPEV_LFP": 350, "BPEV_NCM111": 349, "BPEV_NCM523": 303, "BPEV_NCM622": 305,
+    "BPEV_NCM811": 479, "BPEV_NCA": 208, "HPEV_LFP": 357, "HPEV_NCM111": 333,
+    "HPEV_NCM523": 278, "HPEV_NCM622": 250, "HPEV_NCM811": 227, "HPEV_NCA": 278,
+}
+
+CEV_BATTERY_WEIGHTS = {
+    "BCEV_LFP": 790, "BCEV_NCM111": 762, "BCEV_NCM523": 783, "BCEV_NCM622": 833,
+    "BCEV_NCM811": 846, "BCEV_NCA": 926, "HCEV_LFP": 160, "HCEV_NCM111": 170,
+    "HCEV_NCM523": 174, "HCEV_NCM622": 188, "HCEV_NCM811": 190, "HCEV_NCA": 204
+}
+
+# Nominal battery capacity (kWh); the usable share is drawn from CAPACITY_FACTOR_RANGE
+PEV_NOMINAL_CAPACITY = {
+    'BPEV_LFP': 50,
+    'BPEV_NCM111': 42,
+    'BPEV_NCM523': 40.5,
+    'BPEV_NCM622': 54,
+    'BPEV_NCM811': 78,
+    'BPEV_NCA': 75,
+    'HPEV_LFP': 15,
+    'HPEV_NCM111': 20,
+    'HPEV_NCM523': 18,
+    'HPEV_NCM622': 35,
+    'HPEV_NCM811': 40,
+    'HPEV_NCA': 15,
+}
+
+CEV_NOMINAL_CAPACITY = {
+    'BCEV_LFP': 150,
+    'BCEV_NCM111': 160,
+    'BCEV_NCM523': 180,
+    'BCEV_NCM622': 180,
+    'BCEV_NCM811': 200,
+    'BCEV_NCA': 220,
+    'HCEV_LFP': 30,
+    'HCEV_NCM111': 35,
+    'HCEV_NCM523': 40,
+    'HCEV_NCM622': 48,
+    'HCEV_NCM811': 55,
+    'HCEV_NCA': 64,
+}
+
+# Usable share of the nominal battery capacity
+CAPACITY_FACTOR_RANGE = (0.6, 0.8)
+
+# ED scenario: yearly energy density growth after the baseline, with narrower capacity and weight draws
+ED_ENERGY_DENSITY_GROWTH = 1.03
+ED_CAPACITY_FACTOR_RANGE = (0.7, 0.8)
+ED_WEIGHT_FACTOR_RANGE = (0.95, 1.05)
+
+# Energy density growth rates of the ED sensitivity analysis
+ED_SENSITIVITY_FACTORS = [1.01, 1.02, 1.03, 1.04, 1.05]
+
+# Seed of the battery parameter draws; None draws fresh parameters on every run
+RANDOM_SEED = None
+
+# Monte Carlo uncertainty mode: number of parameter samples and reported percentiles
+MONTE_CARLO_SAMPLES = 1000
+MONTE_CARLO_PERCENTILES = (5, 50, 95)
+
+# Seed of the Monte Carlo draws, fixed so that the summary can be reproduced
+MONTE_CARLO_SEED = 2024
+
+# LE scenario: battery lifetime (Weibull scale) extension after the baseline
+LE_ADJUSTMENT_FACTOR = 1.1
+
+# EOL scenarios and vehicle classes
+SCENARIOS = ['BS', 'TP', 'ED', 'LE']
+VEHICLE_CLASSES = {
+    'PEV': {
+        'predictions_path': PEV_PREDICTIONS_PATH,
+        'value_column': 'PEV_number',
+        'tp_proportion_path': PEV_TP_PROPORTION_PATH,
+        'years': PEV_YEARS,
+        'vehicle_proportion': PEV_VEHICLE_PROPORTION,
+        'weibull_params': PEV_WEIBULL_PARAMS,
+        'battery_weights': PEV_BATTERY_WEIGHTS,
+        'nominal_capacity': PEV_NOMINAL_CAPACITY,
+    },
+    'CEV': {
+        'predictions_path': CEV_PREDICTIONS_PATH,
+        'value_column': 'CEV_number',
+        'tp_proportion_path': CEV_TP_PROPORTION_PATH,
+        'years': CEV_YEARS,
+        'vehicle_proportion': CEV_VEHICLE_PROPORTION,
+        'weibull_params': CEV_WEIBULL_PARAMS,
+        'battery_weights': CEV_BATTERY_WEIGHTS,
+        'nominal_capacity': CEV_NOMINAL_CAPACITY,
+    },
+}
+
+
+# Parameter overrides of individual (scenario, vehicle class) combinations
+SCENARIO_OVERRIDES = {}
+
+# Simulation battery types: LFP, and NCM for the NCM grades and NCA
+BATTERY_TYPES = ['LFP', 'NCM']
+BATTERY_TYPE_OF_CHEMISTRY = {
+    'LFP': 'LFP',
+    'NCM111': 'NCM',
+    'NCM523': 'NCM',
+    'NCM622': 'NCM',
+    'NCM811': 'NCM',
+    'NCA': 'NCM',
+}
+
+# Output workbooks
+EOL_OUTPUT_PATHS = {
+    ('BS', 'PEV'): './output data_prediction/BS_EOL power battery from PEV.xlsx',
+    ('TP', 'PEV'): './output data_prediction/TP_EOL power battery from PEV.xlsx',
+    ('ED', 'PEV'): './output data_prediction/ED_EOL power battery from PEV.xlsx',
+    ('LE', 'PEV'): './output data_prediction/LE_EOL power battery from PEV.xlsx',
+    ('BS', 'CEV'): './output data_prediction/BS_EOL power battery from CEV.xlsx',
+    ('TP', 'CEV'): './output data_prediction/TP_EOL power battery from CEV.xlsx',
+    ('ED', 'CEV'): './output data_prediction/ED_EOL power battery from CEV.xlsx',
+    ('LE', 'CEV'): './output data_prediction/LE_EOL_power_battery_from_CEV.xlsx',
+}
+# Retired LFP/NCM batteries of all EOL scenarios, PEV and CEV combined (the table of the simulation input;
+# the published './input data/EOL LFP and NCM battery.xlsx' read by the Simulation scripts is not overwritten)
+BATTERY_TYPE_OUTPUT_PATH = './output data_prediction/EOL LFP and NCM battery.xlsx'
+
+# Formats written by save_eol_results: any of 'parquet', 'feather' and 'excel' (Excel is an optional export)
+EOL_OUTPUT_FORMATS = ['parquet']
+
+# Saved sales matrices and retired count cubes of the incremental mode
+EOL_STATE_DIR = './output data_prediction/EOL state'
+MONTE_CARLO_OUTPUT_PATH = './output data_prediction/Monte Carlo EOL power battery.xlsx'
+SENSITIVITY_OUTPUT_PATHS = {
+    'PEV': './sensitivity analysis results/ED_PEV_sensitivity analysis results.xlsx',
+    'CEV': './sensitivity analysis results/ED_CEV_sensitivity analysis results.xlsx',
+}
@@ -0,0 +1,991 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from Input_data_cache import input_digest, iter_workbook_chunks, read_input_table
+from Prediction_EOL_engine import build_battery_type_table
+from Simulation_parameters import (
+    BATTERY_METAL_CONTENT, DEMAND_SCENARIOS, IMPACTS, LCA_DATA_PATHS, LCA_PATHWAYS, LCA_TRANSITION_CURVE,
+    LCA_TRANSITION_END_YEAR, LCA_TRANSITION_START_YEAR, PROPORTION_DATA_PATH, RECOVERY_EFFICIENCY,
+    RECYCLING_METHODS, SIMULATION_CHUNK_SIZE, SIMULATION_DATA_PATH, SIMULATION_METHODS, SIMULATION_WORKERS,
+    VALIDATION_FAIL_FAST,
+)
+
+
+# Battery types of the simulation input
+BATTERY_TYPES = ['LFP', 'NCM']
+
+# Recovered metals, in output column order
+METALS = ['nickel', 'cobalt', 'lithium', 'manganese']
+
+# Key columns of the simulation workbooks
+RESULT_KEYS = ['Year', 'City', 'Province', 'Scenario', 'Battery type']
+
+
+# Transition curves from the baseline to the target LCA data: progress t in [0, 1] -> share of the change
+def linear_transition(t):
+    return t
+
+
+def logistic_transition(t, steepness=10):
+    # Rescaled so that the curve runs from exactly 0 to exactly 1
+    low, high = 1 / (1 + np.exp(steepness / 2)), 1 / (1 + np.exp(-steepness / 2))
+    return (1 / (1 + np.exp(-steepness * (t - 0.5))) - low) / (high - low)
+
+
+def step_transition(t):
+    return (t >= 1).astype(float)
+
+
+TRANSITION_CURVES = {
+    'linear': linear_transition,
+    'logistic': logistic_transition,
+    'step': step_transition,
+}
+
+
+# Build the dense LCA tensor
+def build_lca_tensor(environment_impact_df, methods, impacts):
+    """
+    Environmental impact per ton of battery for every province, recycling method and impact category
+    :param environment_impact_df: LCA table with 'Province', 'Impact' and one column per method
+    :param methods: Recycling methods, in kernel order
+    :param impacts: Impact categories, in output order
+    :return: Tuple of (provinces Index, array of shape province × method × impact); missing entries
+             (including methods without a column) are 0
+    """
+    lca_df = environment_impact_df[environment_impact_df['Impact'].isin(impacts)]
+    lca_df = lca_df.drop_duplicates(['Province', 'Impact'], keep='last')  # Later rows override earlier ones
+    provinces = pd.Index(lca_df['Province'].unique())
+
+    lca = np.zeros((len(provinces), len(methods), len(impacts)))
+    province_codes = provinces.get_indexer(lca_df['Province'])
+    impact_codes = pd.Index(impacts).get_indexer(lca_df['Impact'])
+    lca[province_codes, :, impact_codes] = lca_df.reindex(columns=list(methods), fill_value=0).to_numpy(dtype=float)
+    return provinces, lca
+
+
+# LCA tensor of one workbook, cached per file content, methods and impacts
+@lru_cache(maxsize=None)
+def _cached_lca_tensor(path, digest, methods, impacts):
+    lca_df = read_input_table(path)
+    lca_df['Province'] = lca_df['Province'].str.strip()
+    provinces, lca = build_lca_tensor(lca_df, list(methods), list(impacts))
+    lca.setflags(write=False)
+    return provinces, lca
+
+
+# Load the LCA tensor of a workbook
+def load_lca_tensor(path, methods=SIMULATION_METHODS, impacts=IMPACTS):
+    """
+    Melt an LCA workbook into a dense float64 province × method × impact array. Memoized per file content,
+    methods and impacts, so every scenario of a run shares the same arrays
+    :param path: LCA workbook with 'Province', 'Impact' and one column per method, e.g. the Secondary Use LFP
+                 column of the secondary-use workbook
+    :param methods: Recycling methods, in kernel order (methods without a column have zero impact)
+    :param impacts: Impact categories, in output order
+    :return: Tuple of (provinces Index, read-only array of shape province × method × impact)
+    """
+    return _cached_lca_tensor(os.path.abspath(path), input_digest(path), tuple(methods), tuple(impacts))
+
+
+# LCA tensor of a workbook path or of an LCA table
+def _lca_tensor(source, methods, impacts):
+    if isinstance(source, str):
+        return load_lca_tensor(source, methods, impacts)
+    return build_lca_tensor(source, methods, impacts)
+
+
+# Share of the change from the baseline to the target LCA data reached in each year
+def transition_weights(years, start_year=2024, end_year=2030, curve='linear'):
+    """
+    The change is spread over the years start_year to end_year - 1 and complete from end_year - 1 on,
+    e.g. a linear transition from 2024 to 2030 reaches 1/6 in 2024, 2/6 in 2025 and 6/6 in 2029
+    :param years: Years
+    :param start_year: First year with a share of the change
+    :param end_year: First year after the transition
+    :param curve: Name in TRANSITION_CURVES, or a function mapping progress in [0, 1] to the share of the change
+    :return: Array of weights in [0, 1], one per year
+    """
+    transition = TRANSITION_CURVES[curve] if isinstance(curve, str) else curve
+    progress = (np.asarray(years, dtype=float) - start_year + 1) / (end_year - start_year)
+    return transition(np.clip(progress, 0, 1))
+
+
+# Build the year-interpolated LCA cube of several target pathways
+def build_interpolated_lca_cube(baseline_df, pathway_dfs, methods, impacts, years, start_year=2024, end_year=2030,
+                                curve='linear'):
+    """
+    LCA tensors of every pathway and year, moving from the baseline LCA data to each pathway's data
+    along a transition curve: value = baseline + w(year) * (pathway - baseline)
+    :param baseline_df: Baseline LCA table with 'Province', 'Impact' and one column per method, or its workbook path
+    :param pathway_dfs: Dictionary {pathway: LCA table or workbook path}, e.g. {'SSP1': ssp1_df, ...}
+    :param methods: Recycling methods, in kernel order
+    :param impacts: Impact categories, in output order
+    :param years: Years of the cube
+    :param start_year: First year with a share of the change, see transition_weights
+    :param end_year: First year after the transition, see transition_weights
+    :param curve: Transition curve, see transition_weights
+    :return: Tuple of (provinces Index, years Index, array of shape pathway × year × province × method × impact);
+             provinces missing from a table have zero impact in that table
+    """
+    return interpolate_lca_tensors(_lca_tensor(baseline_df, methods, impacts),
+                                   [_lca_tensor(table, methods, impacts) for table in pathway_dfs.values()],
+                                   years, start_year, end_year, curve)
+
+
+# Interpolate between LCA tensors over the years
+def interpolate_lca_tensors(baseline, pathways, years, start_year=2024, end_year=2030, curve='linear'):
+    """
+    :param baseline: Tuple of (provinces Index, province × method × impact array), e.g. from load_lca_tensor
+    :param pathways: List of such tuples, one per target pathway
+    For the other parameters and the return value see build_interpolated_lca_cube
+    """
+    tensors = [baseline] + list(pathways)
+    provinces = pd.Index(pd.unique(np.concatenate([table_provinces.to_numpy() for table_provinces, _ in tensors])))
+
+    # Align every tensor to the union of provinces
+    aligned = np.zeros((len(tensors), len(provinces)) + baseline[1].shape[1:])
+    for k, (table_provinces, lca) in enumerate(tensors):
+        aligned[k, provinces.get_indexer(table_provinces)] = lca
+    baseline, pathways = aligned[0], aligned[1:]
+
+    years = pd.Index(years)
+    weights = transition_weights(years, start_year, end_year, curve)
+    cube = baseline + weights[None, :, None, None, None] * (pathways - baseline)[:, None]
+    return provinces, years, cube
+
+
+# Build the method × metal recovery efficiency matrix
+def build_efficiency_matrix(recovery_efficiency, methods, metals=METALS):
+    """
+    :param recovery_efficiency: Dictionary {method: {metal: efficiency}}; missing metals recover nothing
+    :param methods: Recycling methods, in kernel order
+    :param metals: Recovered metals, in output order
+    :return: Array of shape method × metal
+    """
+    return np.array([[recovery_efficiency[method].get(metal, 0) for metal in metals] for method in methods], dtype=float)
+
+
+# Build the battery type × metal content matrix
+def build_metal_content_matrix(battery_metal_content, battery_types=BATTERY_TYPES, metals=METALS):
+    """
+    :param battery_metal_content: Dictionary {battery type: {metal: content in kg/kWh}}
+    :param battery_types: Battery types, in kernel order
+    :param metals: Recovered metals, in output order
+    :return: Array of shape battery type × metal
+    """
+    return np.array([[battery_metal_content[battery_type].get(metal, 0) for metal in metals]
+                     for battery_type in battery_types], dtype=float)
+
+
+# Encode the kernel inputs of the retirement rows as arrays
+def encode_simulation_rows(df, methods, battery_types=BATTERY_TYPES):
+    """
+    :param df: Battery retirement rows with 'Year', 'City', 'Province', 'Battery type', 'Weight (thousand t)',
+               'Capacity (GWh)' and one proportion column per method (missing columns count as 0)
+    :param methods: Recycling methods, in kernel order
+    :param battery_types: Battery types, in the order of the metal content matrix
+    :return: Dictionary of row arrays ('year', 'battery_type', 'province' and 'city' codes, 'weight', 'capacity',
+             'proportions' of shape row × method) and their labels ('provinces', 'cities')
+    """
+    battery_type_codes = pd.Index(battery_types).get_indexer(df['Battery type'])
+    if (battery_type_codes < 0).any():
+        raise ValueError(f"Unknown battery types: {list(pd.unique(df['Battery type'][battery_type_codes < 0]))}")
+    province_codes, provinces = pd.factorize(df['Province'])
+    city_codes, cities = pd.factorize(df['City'])
+    return {
+        'year': pd.to_numeric(df['Year']).to_numpy(dtype=np.int64),
+        'battery_type': battery_type_codes,
+        'province': province_codes,
+        'city': city_codes,
+        'weight': df['Weight (thousand t)'].to_numpy(dtype=float),
+        'capacity': df['Capacity (GWh)'].to_numpy(dtype=float),
+        'proportions': df.reindex(columns=list(methods), fill_value=0).to_numpy(dtype=float),
+        'provinces': pd.Index(provinces),
+        'cities': pd.Index(cities),
+    }
+
+
+# Warn once about rows whose applicable proportions do not sum to 1
+def check_proportion_sums(rows, proportions, battery_types=BATTERY_TYPES, tolerance=0.001):
+    total_proportion = proportions.sum(axis=1)
+    deviating = np.flatnonzero(np.abs(total_proportion - 1) > tolerance)
+    if len(deviating):
+        examples = ', '.join(f"{rows['cities'][rows['city'][row]]} {battery_types[rows['battery_type'][row]]} "
+                             f"({total_proportion[row]:.4f})" for row in deviating[:5])
+        print(f"Warning: The sum of proportions of available processes is not equal to 1 in {len(deviating)} rows, "
+              f"e.g. {examples}")
+
+
+# Columns of the input validation report
+VALIDATION_COLUMNS = ['Check', 'Table', 'Count', 'Keys']
+
+
+# One row of the validation report
+def _validation_row(check, table, keys, count=None, max_keys=10):
+    keys = [str(key) for key in keys]
+    count = len(keys) if count is None else count
+    return {'Check': check, 'Table': table, 'Count': count,
+            'Keys': '; '.join(keys[:max_keys]) + (' ...' if count > max_keys else '')}
+
+
+# Keys of the retirement rows selected by a mask
+def _row_keys(df, mask, max_keys=10):
+    return [' / '.join(map(str, key)) for key in df.loc[mask, RESULT_KEYS].head(max_keys).itertuples(index=False)]
+
+
+# Validate the simulation inputs once before computation
+def validate_simulation_inputs(df, lca_tables=None, methods=RECYCLING_METHODS, impacts=IMPACTS,
+                               sum_tolerance=0.001, lca_methods=None, battery_types=BATTERY_TYPES, max_keys=10,
+                               fail_fast=False):
+    """
+    Check the merged retirement rows and the LCA tables with vectorized masks: missing values, negative tonnage
+    and proportions, the proportion sum of each row's applicable methods, unknown battery types, and provinces,
+    methods and impacts missing from the LCA tables (the kernel counts them as zero impact)
+    :param df: Merged retirement rows, see calculate_impact_arrays
+    :param lca_tables: Dictionary {LCA name: LCA table with 'Province', 'Impact' and one column per method}
+    :param methods: Recycling methods (missing proportion columns count as 0)
+    :param impacts: Impact categories
+    :param sum_tolerance: Largest accepted deviation of a proportion sum from 1 (None to skip the check)
+    :param lca_methods: Dictionary {LCA name: methods looked up in that table} (methods for tables not listed)
+    :param battery_types: Battery types
+    :param max_keys: Offending keys listed per check
+    :param fail_fast: Raise a ValueError listing the failed checks instead of returning the report
+    :return: DataFrame with VALIDATION_COLUMNS, one row per check: number of offending rows or keys
+             (0 if the check passed) and the first max_keys of them
+    """
+    # Row arrays: amounts, proportions and the methods applicable to each row's battery type
+    battery_type_codes = pd.Index(battery_types).get_indexer(df['Battery type'])
+    known_battery_type = battery_type_codes >= 0
+    applicable = np.array([[battery_type in method for method in methods] for battery_type in battery_types])
+    row_applicable = applicable[battery_type_codes] & known_battery_type[:, None]
+    amounts = df[['Weight (thousand t)', 'Capacity (GWh)']].to_numpy(dtype=float)
+    proportions = df.reindex(columns=list(methods), fill_value=0).to_numpy(dtype=float)
+
+    row_checks = {
+        'Unknown battery type': ~known_battery_type,
+        'Missing values': np.isnan(amounts).any(axis=1) | (row_applicable & np.isnan(proportions)).any(axis=1),
+        'Negative tonnage': (amounts < 0).any(axis=1),
+        'Negative proportion': (row_applicable & (proportions < 0)).any(axis=1),
+    }
+    if sum_tolerance is not None:
+        total_proportion = np.where(row_applicable, proportions, 0).sum(axis=1)
+        row_checks['Proportion sum'] = known_battery_type & (np.abs(total_proportion - 1) > sum_tolerance)
+    report = [_validation_row(check, 'retirement data', _row_keys(df, mask, max_keys), int(mask.sum()), max_keys)
+              for check, mask in row_checks.items()]
+
+    # Keys the LCA tables lack
+    provinces = pd.Index(pd.unique(df['Province']))
+    for name, lca_df in (lca_tables or {}).items():
+        table_methods = pd.Index((lca_methods or {}).get(name, methods))
+        report += [
+            _validation_row('Unmatched LCA province', name, provinces[~provinces.isin(lca_df['Province'])],
+                            max_keys=max_keys),
+            _validation_row('Unmatched LCA method', name, table_methods[~table_methods.isin(lca_df.columns)],
+                            max_keys=max_keys),
+            _validation_row('Unmatched LCA impact', name, [impact for impact in impacts
+                                                           if impact not in set(lca_df['Impact'])], max_keys=max_keys),
+        ]
+
+    report = pd.DataFrame(report, columns=VALIDATION_COLUMNS)
+    if fail_fast and (report['Count'] > 0).any():
+        raise ValueError(f"Input validation failed:\n{report[report['Count'] > 0].to_string(index=False)}")
+    return report
+
+
+# Validate the inputs of a set of demand-side scenarios
+def validate_scenario_inputs(df, scenarios=DEMAND_SCENARIOS, lca_tables=None, methods=SIMULATION_METHODS,
+                             impacts=IMPACTS, fail_fast=False):
+    """
+    Validate once for all scenarios: the proportion sums with the strictest sum_tolerance of the scenarios, and
+    each scenario's LCA table for the methods the scenario can give a share (proportion columns of df,
+    replacement and transfer target methods)
+    :param df: Merged retirement rows
+    :param scenarios: Demand-side scenarios, see DEMAND_SCENARIOS
+    :param lca_tables: LCA tables (from load_lca_tables; None to check the retirement rows only)
+    :param methods: Recycling methods, in kernel order
+    :param impacts: Impact categories
+    :param fail_fast: Raise a ValueError listing the failed checks instead of returning the report
+    :return: Report of validate_simulation_inputs
+    """
+    tolerances = [scenario['sum_tolerance'] for scenario in scenarios if scenario.get('sum_tolerance') is not None]
+    lca_methods = {}
+    for scenario in scenarios:
+        used = [method for method in methods if method in df.columns]
+        used += list((scenario.get('replacement_methods') or {}).values())
+        used += [target for _, target in scenario.get('transfers') or []]
+        lca_methods[scenario['lca']] = list(dict.fromkeys(lca_methods.get(scenario['lca'], []) + used))
+    lca_tables = {name: lca_tables[name] for name in lca_methods} if lca_tables is not None else None
+    return validate_simulation_inputs(df, lca_tables, methods, impacts, min(tolerances) if tolerances else None,
+                                      lca_methods, fail_fast=fail_fast)
+
+
+# Print the failed checks of a validation report
+def print_validation_report(report):
+    failed = report[report['Count'] > 0]
+    if failed.empty:
+        print(f"Input validation: all {len(report)} checks passed")
+    else:
+        print(f"Input validation: {len(failed)} of {len(report)} checks failed")
+        print(failed.to_string(index=False))
+
+
+# Linear proportion shift of one unit ratio
+def build_shift_matrix(methods, transfers):
+    """
+    Express a technology shift as a linear map: shifting by ratio r changes a proportion row p by r * p @ shift
+    :param methods: Recycling methods, in kernel order
+    :param transfers: (source method, target method) pairs; the ratio of each source's share moves to its target
+    :return: Array of shape method × method
+    """
+    method_index = {method: i for i, method in enumerate(methods)}
+    shift = np.zeros((len(methods), len(methods)))
+    for source, target in transfers:
+        shift[method_index[source], method_index[source]] -= 1
+        shift[method_index[source], method_index[target]] += 1
+    return shift
+
+
+# Impact and metal arrays over a grid of shift ratios
+def calculate_impact_arrays(df, methods, lca_provinces, lca, efficiency, metal_content, ratios=(0,), shift=None,
+                            replacement_methods=None, shift_from_year=None, renormalize=False, weight_factor=1e3,
+                            check_capacity=True, sum_tolerance=None, battery_types=BATTERY_TYPES, lca_years=None):
+    """
+    Environmental impact and recovered metals of every row for every shift ratio.
+    The method proportions of each row form a (rows × methods) matrix, masked to the methods of the row's
+    battery type. Impacts are one einsum of the tonnage-weighted proportions with the LCA tensor of the row's
+    province, metals one einsum with the efficiency matrix and the metal content. The shifted proportions
+    are p + r * delta, with delta = p @ shift for technology shifts and delta = e - p when the ratio of the
+    whole amount goes to a replacement method e (second use). The row sum is invariant under a shift, so
+    the results are affine in r: the kernel runs once for p and once for delta, and the ratio grid is a broadcast.
+    A (row, method) pair is skipped at a ratio when its amount at that ratio, weight * (p + r * delta) (and
+    capacity * (p + r * delta) with check_capacity), is negative or missing, as in a loop over the ratios.
+    Pairs valid at every ratio go through the affine kernel; rows with pairs valid at some ratios only are
+    corrected by evaluating those pairs at each ratio where they are valid.
+    :param df: Battery retirement rows with 'Year', 'City', 'Province', 'Battery type', 'Weight (thousand t)',
+               'Capacity (GWh)' and one proportion column per method (missing columns count as 0)
+    :param methods: Recycling methods, in kernel order
+    :param lca_provinces: Provinces of the LCA tensor (from build_lca_tensor)
+    :param lca: Province × method × impact LCA tensor (from build_lca_tensor), or year × province × method × impact
+                with lca_years (one pathway of build_interpolated_lca_cube)
+    :param efficiency: Method × metal recovery efficiency matrix (from build_efficiency_matrix)
+    :param metal_content: Battery type × metal content matrix in kg/kWh (from build_metal_content_matrix)
+    :param ratios: Shift ratios in [0, 1]
+    :param shift: Method × method shift matrix from build_shift_matrix (None for no shift)
+    :param replacement_methods: Dictionary {battery type: method} receiving the ratio of the whole battery
+                                amount, e.g. {'LFP': 'Secondary Use LFP', 'NCM': 'Secondary Use NCM'}
+    :param shift_from_year: First year whose proportions are shifted (None for all years)
+    :param renormalize: Divide the proportions of each row by their sum over the row's methods (if positive)
+    :param weight_factor: Tons per unit of 'Weight (thousand t)'
+    :param check_capacity: Also skip (row, method) pairs with a negative capacity amount, not only a negative
+                           weight amount
+    :param sum_tolerance: Warn about rows whose proportions deviate from 1 by more than this (None for no check)
+    :param battery_types: Battery types, in the order of the metal content matrix
+    :param lca_years: Years of a year-indexed LCA tensor (None for a province × method × impact tensor)
+    :return: Tuple of (impacts of shape ratio × row × impact, metals of shape ratio × row × metal)
+    """
+    return calculate_row_impacts(encode_simulation_rows(df, methods, battery_types), methods, lca_provinces, lca,
+                                 efficiency, metal_content, ratios, shift, replacement_methods, shift_from_year,
+                                 renormalize, weight_factor, check_capacity, sum_tolerance, battery_types, lca_years)
+
+
+# Array kernel of calculate_impact_arrays
+def calculate_row_impacts(rows, methods, lca_provinces, lca, efficiency, metal_content, ratios=(0,), shift=None,
+                          replacement_methods=None, shift_from_year=None, renormalize=False, weight_factor=1e3,
+                          check_capacity=True, sum_tolerance=None, battery_types=BATTERY_TYPES, lca_years=None):
+    """
+    :param rows: Row arrays from encode_simulation_rows
+    For the other parameters and the return value see calculate_impact_arrays
+    """
+    ratios = np.asarray(ratios, dtype=float)
+    if ((ratios < 0) | (ratios > 1)).any():
+        raise ValueError("Shift ratios must lie within [0, 1]")
+
+    # Methods applicable to each battery type
+    applicable = np.array([[battery_type in method for method in methods] for battery_type in battery_types])
+    battery_type_codes = rows['battery_type']
+    row_applicable = applicable[battery_type_codes]
+    proportions = np.where(row_applicable, rows['proportions'], 0)
+    if sum_tolerance is not None:
+        check_proportion_sums(rows, proportions, battery_types, sum_tolerance)
+
+    # Change of the proportions per unit ratio, for the shifted years only
+    shifted_rows = np.ones(len(proportions), dtype=bool)
+    if shift_from_year is not None:
+        shifted_rows = rows['year'] >= shift_from_year
+    delta = np.zeros_like(proportions)
+    if shift is not None:
+        # A missing source proportion leaves its targets missing; the other methods of the row are unaffected
+        shifted_proportions = proportions[shifted_rows]
+        row_delta = np.nan_to_num(shifted_proportions) @ shift
+        row_delta[np.isnan(shifted_proportions) @ np.abs(shift) > 0] = np.nan
+        delta[shifted_rows] = np.where(row_applicable[shifted_rows], row_delta, 0)
+    if replacement_methods is not None:
+        replacement = np.zeros((len(battery_types), len(methods)))
+        for i, battery_type in enumerate(battery_types):
+            replacement[i, list(methods).index(replacement_methods[battery_type])] = 1
+        delta[shifted_rows] += replacement[battery_type_codes[shifted_rows]] - proportions[shifted_rows]
+
+    if renormalize:
+        total_proportion = np.nansum(proportions, axis=1)
+        normalizable = total_proportion > 0  # Avoid division by zero
+        if not normalizable.all():
+            print(f"Warning: {np.count_nonzero(~normalizable)} rows have no positive proportion sum and are not "
+                  f"renormalized, e.g. row index {np.flatnonzero(~normalizable)[:5].tolist()}")
+        proportions[normalizable] /= total_proportion[normalizable, None]
+        delta[normalizable] /= total_proportion[normalizable, None]
+
+    battery_weight = rows['weight'] * weight_factor  # Convert to tons
+    battery_capacity_kwh = rows['capacity'] * 1e6  # Convert to kWh
+
+    # Skip (row, method) pairs with negative or missing amounts at each ratio (ratio × row × method)
+    shifted = proportions + ratios[:, None, None] * delta
+    valid = battery_weight[:, None] * shifted >= 0
+    if check_capacity:
+        valid &= battery_capacity_kwh[:, None] * shifted >= 0
+    always_valid = valid.all(axis=0)
+    skipped = row_applicable & ~always_valid
+    if skipped.any():
+        examples = ', '.join(f"{rows['cities'][rows['city'][row]]} {methods[method]}"
+                             for row, method in list(zip(*np.nonzero(skipped)))[:5])
+        print(f"Skipping invalid data: {np.count_nonzero(skipped)} (row, method) pairs with negative or missing "
+              f"amounts at one or more ratios, e.g. {examples}")
+    base_and_delta = np.where(always_valid, np.stack([proportions, delta]), 0)
+
+    # Provinces (and years) without LCA data have zero impact: code -1 selects the zero padding
+    province_codes = np.append(lca_provinces.get_indexer(rows['provinces']), -1)[rows['province']]
+    if lca_years is None:
+        row_lca = np.pad(lca, ((0, 1), (0, 0), (0, 0)))[province_codes]
+    else:
+        year_codes = lca_years.get_indexer(rows['year'])
+        row_lca = np.pad(lca, ((0, 1), (0, 1), (0, 0), (0, 0)))[year_codes, province_codes]
+
+    battery_weight = np.nan_to_num(battery_weight)
+    battery_capacity_kwh = np.nan_to_num(battery_capacity_kwh)
+    row_metal_content = metal_content[battery_type_codes]
+    impact_totals = np.einsum('r,srm,rmi->sri', battery_weight, base_and_delta, row_lca)
+    total_metals = np.einsum('r,srm,mk,rk->srk', battery_capacity_kwh, base_and_delta, efficiency, row_metal_content)
+
+    # Affine in the ratio: base + r * delta
+    impact_totals = impact_totals[0] + ratios[:, None, None] * impact_totals[1]
+    total_metals = total_metals[0] + ratios[:, None, None] * total_metals[1]
+
+    # Pairs valid at some ratios only: add their amounts at the ratios where they are valid
+    partial = valid & ~always_valid
+    partial_rows = np.flatnonzero(partial.any(axis=(0, 2)))
+    if len(partial_rows):
+        amounts = np.where(partial[:, partial_rows], shifted[:, partial_rows], 0)
+        impact_totals[:, partial_rows] += np.einsum('r,srm,rmi->sri', battery_weight[partial_rows], amounts,
+                                                    row_lca[partial_rows])
+        total_metals[:, partial_rows] += np.einsum('r,srm,mk,rk->srk', battery_capacity_kwh[partial_rows], amounts,
+                                                   efficiency, row_metal_content[partial_rows])
+    return impact_totals, total_metals
+
+
+# Frame impact and metal arrays like the simulation workbooks
+def impact_results_frame(keys, impacts, impact_totals, total_metals, metals=METALS):
+    """
+    :param keys: DataFrame with the RESULT_KEYS columns, one row per result row
+    :return: DataFrame with 'Year', 'City', 'Province', 'Scenario', 'Battery type', the impacts and the metals
+    """
+    return pd.concat([
+        keys[RESULT_KEYS].reset_index(drop=True),
+        pd.DataFrame(impact_totals, columns=list(impacts)),
+        pd.DataFrame(total_metals, columns=list(metals)),
+    ], axis=1)
+
+
+# Vectorized environmental impact and metal recovery kernel
+def calculate_environmental_impact(df, methods, impacts, lca_provinces, lca, efficiency, metal_content,
+                                   sum_tolerance=None, metals=METALS, battery_types=BATTERY_TYPES, lca_years=None):
+    """
+    Environmental impact and recovered metals of every row of the battery retirement table (no shift)
+    :param df: Battery retirement rows, see calculate_impact_arrays
+    :param methods: Recycling methods, in kernel order
+    :param impacts: Impact categories, in output order
+    :param lca_provinces: Provinces of the LCA tensor (from build_lca_tensor)
+    :param lca: Province × method × impact LCA tensor (from build_lca_tensor), or year × province × method × impact
+                with lca_years
+    :param efficiency: Method × metal recovery efficiency matrix (from build_efficiency_matrix)
+    :param metal_content: Battery type × metal content matrix in kg/kWh (from build_metal_content_matrix)
+    :param sum_tolerance: Warn about rows whose proportions deviate from 1 by more than this (None for no check)
+    :param metals: Recovered metals, in output order
+    :param battery_types: Battery types, in the order of the metal content matrix
+    :param lca_years: Years of a year-indexed LCA tensor (None for a province × method × impact tensor)
+    :return: DataFrame with 'Year', 'City', 'Province', 'Scenario', 'Battery type', the impacts and the metals
+    """
+    impact_totals, total_metals = calculate_impact_arrays(df, methods, lca_provinces, lca, efficiency, metal_content,
+                                                          sum_tolerance=sum_tolerance, battery_types=battery_types,
+                                                          lca_years=lca_years)
+    return impact_results_frame(df, impacts, impact_totals[0], total_metals[0], metals)
+
+
+# Evaluate a grid of technology shift ratios at once
+def sweep_environmental_impact(df, methods, impacts, lca_provinces, lca, efficiency, metal_content, ratios,
+                               transfers=None, replacement_methods=None, shift_from_year=None, renormalize=False,
+                               weight_factor=1e3, check_capacity=True, sum_tolerance=None, metals=METALS,
+                               battery_types=BATTERY_TYPES):
+    """
+    Environmental impact and recovered metals for every ratio of a technology shift or second use,
+    e.g. np.linspace(0, 1, 101)
+    :param df: Battery retirement rows, see calculate_impact_arrays
+    :param methods: Recycling methods, in kernel order
+    :param impacts: Impact categories, in output order
+    :param lca_provinces: Provinces of the LCA tensor (from build_lca_tensor)
+    :param lca: Province × method × impact LCA tensor (from build_lca_tensor)
+    :param efficiency: Method × metal recovery efficiency matrix (from build_efficiency_matrix)
+    :param metal_content: Battery type × metal content matrix in kg/kWh (from build_metal_content_matrix)
+    :param ratios: Shift ratios in [0, 1]
+    :param transfers: (source method, target method) pairs of the shift, see build_shift_matrix
+    :param replacement_methods: Dictionary {battery type: method} receiving the ratio of the whole battery amount
+    :param shift_from_year: First year whose proportions are shifted (None for all years)
+    :param renormalize: Divide the proportions of each row by their sum over the row's methods (if positive)
+    :param weight_factor: Tons per unit of 'Weight (thousand t)'
+    :param check_capacity: Also skip (row, method) pairs with a negative capacity amount, not only a negative
+                           weight amount
+    :param sum_tolerance: Warn about rows whose proportions deviate from 1 by more than this (None for no check)
+    :param metals: Recovered metals, in output order
+    :param battery_types: Battery types, in the order of the metal content matrix
+    :return: DataFrame with 'Ratio' followed by the calculate_environmental_impact columns, one block per ratio
+    """
+    ratios = np.atleast_1d(np.asarray(ratios, dtype=float))
+    shift = build_shift_matrix(methods, transfers) if transfers else None
+    impact_totals, total_metals = calculate_impact_arrays(
+        df, methods, lca_provinces, lca, efficiency, metal_content, ratios, shift, replacement_methods,
+        shift_from_year, renormalize, weight_factor, check_capacity, sum_tolerance, battery_types)
+
+    n_ratios, n_rows = impact_totals.shape[:2]
+    keys = df.iloc[np.tile(np.arange(n_rows), n_ratios)]
+    results_df = impact_results_frame(keys, impacts, impact_totals.reshape(n_ratios * n_rows, -1),
+                                      total_metals.reshape(n_ratios * n_rows, -1), metals)
+    results_df.insert(0, 'Ratio', np.repeat(ratios, n_rows))
+    return results_df
+
+
+# Load the battery retirement data merged with the recycling process proportions
+def load_simulation_inputs(data_path=SIMULATION_DATA_PATH, proportion_data_path=PROPORTION_DATA_PATH,
+                           build_from_eol_engine=False, methods=RECYCLING_METHODS):
+    """
+    :param data_path: Battery retirement workbook
+    :param proportion_data_path: Recycling process proportions by year and city
+    :param build_from_eol_engine: Aggregate the EOL engine results in memory instead of reading data_path
+    :param methods: Proportion columns to merge
+    :return: DataFrame of the retirement rows (string 'Year', stripped keys) with one proportion column per method
+    """
+    df = build_battery_type_table() if build_from_eol_engine else read_input_table(data_path)
+    return merge_proportions(df, read_input_table(proportion_data_path), methods)
+
+
+# Integer codes of the join keys
+def build_key_dictionary(proportion_df):
+    """
+    :param proportion_df: Lookup table with integral 'Year', 'Province' and 'City' (stripped)
+    :return: Dictionary {'Year': sorted Index of years, 'Province': Index of province names,
+             'City name': Index of city names, 'City': sorted Index of the (Province, City) pairs coded as
+             province code × number of city names + city name code}
+    """
+    key_dictionary = {'Year': pd.Index(np.unique(proportion_df['Year'].to_numpy(dtype=np.int64))),
+                      'Province': pd.Index(proportion_df['Province'].unique().astype(object)),
+                      'City name': pd.Index(proportion_df['City'].unique().astype(object))}
+    key_dictionary['City'] = pd.Index(np.unique(_city_pair_codes(proportion_df, key_dictionary)))
+    return key_dictionary
+
+
+# Integer codes of the (Province, City) pairs of each row, -1 for names missing from the dictionary
+def _city_pair_codes(df, key_dictionary):
+    province_codes = pd.Categorical(df['Province'], categories=key_dictionary['Province']).codes.astype(np.int64)
+    city_name_codes = pd.Categorical(df['City'], categories=key_dictionary['City name']).codes.astype(np.int64)
+    return np.where((province_codes < 0) | (city_name_codes < 0), -1,
+                    province_codes * len(key_dictionary['City name']) + city_name_codes)
+
+
+# Integer codes of the join keys of each row
+def encode_keys(df, key_dictionary):
+    """
+    :param df: Table with integral 'Year', 'Province' and 'City'
+    :param key_dictionary: Dictionary from build_key_dictionary
+    :return: Tuple of (year codes, city codes); -1 marks keys missing from the dictionary
+    """
+    year_codes = key_dictionary['Year'].get_indexer(df['Year'].to_numpy(dtype=np.int64))
+    city_codes = key_dictionary['City'].get_indexer(_city_pair_codes(df, key_dictionary))
+    return year_codes, city_codes
+
+
+# Dense (year, city) array of the recycling process proportions
+def build_proportion_array(proportion_df, key_dictionary, methods=RECYCLING_METHODS, proportions=None):
+    """
+    :param proportion_df: Recycling process proportions with 'Year', 'Province', 'City' and one column per method
+    :param key_dictionary: Dictionary from build_key_dictionary(proportion_df)
+    :param methods: Proportion columns
+    :param proportions: Array of an earlier call with the same key dictionary to fill (None for a new array)
+    :return: Array of shape (year + 1) × (city + 1) × method; NaN where the proportion data has no row and in
+             the last year and city slots, so that code -1 gathers NaN (for duplicate keys the last row wins)
+    """
+    if proportions is None:
+        proportions = np.full((len(key_dictionary['Year']) + 1, len(key_dictionary['City']) + 1, len(methods)),
+                              np.nan)
+    year_codes, city_codes = encode_keys(proportion_df, key_dictionary)
+    proportions[year_codes, city_codes] = proportion_df[list(methods)].to_numpy(dtype=float)
+    return proportions
+
+
+# Strip the join keys and convert the years to integers
+def _clean_keys(frame):
+    for column in ['Province', 'City']:
+        frame[column] = frame[column].str.strip()
+    if not pd.api.types.is_integer_dtype(frame['Year']):
+        frame['Year'] = pd.to_numeric(frame['Year'].astype(str).str.strip()).astype(int)
+    return frame
+
+
+# Key dictionary and dense proportion array of a proportion workbook, read chunk by chunk
+def read_proportion_array(proportion_data_path=PROPORTION_DATA_PATH, methods=RECYCLING_METHODS,
+                          chunk_size=SIMULATION_CHUNK_SIZE):
+    """
+    Two passes with the streaming reader: the first collects the distinct (Year, Province, City) keys, the second
+    scatters the proportions of each chunk into the dense (year, city) array. Memory is bounded by the chunk size
+    and the number of distinct keys, not by the number of rows (e.g. of a county-level or monthly table)
+    :param proportion_data_path: Recycling process proportions by year and city
+    :param methods: Proportion columns
+    :param chunk_size: Rows per chunk
+    :return: Tuple of (key dictionary, proportion array), see build_key_dictionary and build_proportion_array
+    """
+    keys = None
+    for chunk in iter_workbook_chunks(proportion_data_path, chunk_size=chunk_size):
+        chunk_keys = _clean_keys(chunk[['Year', 'Province', 'City']].copy()).drop_duplicates()
+        keys = chunk_keys if keys is None else pd.concat([keys, chunk_keys], ignore_index=True).drop_duplicates()
+    key_dictionary = build_key_dictionary(keys)
+
+    proportions = None
+    for chunk in iter_workbook_chunks(proportion_data_path, chunk_size=chunk_size):
+        chunk = _clean_keys(chunk[['Year', 'Province', 'City'] + list(methods)].copy())
+        proportions = build_proportion_array(chunk, key_dictionary, methods, proportions)
+    return key_dictionary, proportions
+
+
+# Merge the recycling process proportions into the battery retirement rows
+def merge_proportions(df, proportion_df=None, methods=RECYCLING_METHODS, proportion_lookup=None):
+    """
+    Year and (Province, City) are mapped to integer codes of the proportion data keys, so the join is a gather
+    from the dense (year, city) proportion array instead of a hash join on string keys
+    :param df: Battery retirement rows with 'Year', 'Province', 'City', 'Scenario', 'Battery type',
+               'Weight (thousand t)' and 'Capacity (GWh)'
+    :param proportion_df: Recycling process proportions with 'Year', 'Province', 'City' and one column per method
+    :param methods: Proportion columns to merge
+    :param proportion_lookup: Tuple of (key dictionary, proportion array) from read_proportion_array, used
+                              instead of proportion_df
+    :return: DataFrame of the retirement rows (string 'Year', stripped keys) with one proportion column per method
+    """
+    df = df.copy()
+
+    # Clean key columns to ensure consistent formatting
+    for column in ['Scenario', 'Battery type']:
+        df[column] = df[column].str.strip()
+    _clean_keys(df)
+    if proportion_lookup is None:
+        proportion_df = _clean_keys(proportion_df[['Year', 'Province', 'City'] + list(methods)].copy())
+        key_dictionary = build_key_dictionary(proportion_df)
+        proportion_lookup = (key_dictionary, build_proportion_array(proportion_df, key_dictionary, methods))
+
+    # Gather the proportions of each row by Year, Province and City
+    key_dictionary, proportion_array = proportion_lookup
+    year_codes, city_codes = encode_keys(df, key_dictionary)
+    df[list(methods)] = proportion_array[year_codes, city_codes]
+
+    # String years, converted once per distinct year
+    years, year_inverse = np.unique(df['Year'].to_numpy(), return_inverse=True)
+    df['Year'] = pd.Index(years.astype(str)).take(year_inverse)
+
+    # Check data integrity
+    for column in ['Weight (thousand t)', 'Capacity (GWh)']:
+        if df[column].isnull().any():
+            raise ValueError(f"Data column {column} has missing values!")
+    if df[list(methods)].isnull().any().any():
+        unmatched_rows = df[df[list(methods)].isnull().any(axis=1)]
+        print("The following rows have unmatched proportion data:")
+        print(unmatched_rows[['Year', 'Province', 'City']])
+        raise ValueError("Unmatched proportion data exists, please check data integrity!")
+    return df
+
+
+# Stream the battery retirement data in chunks merged with the recycling process proportions
+def iter_simulation_inputs(data_path=SIMULATION_DATA_PATH, proportion_data_path=PROPORTION_DATA_PATH,
+                           chunk_size=SIMULATION_CHUNK_SIZE, methods=RECYCLING_METHODS):
+    """
+    Read both workbooks with the streaming reader: the proportion chunks are scattered into the dense (year, city)
+    proportion array (read_proportion_array), then the retirement rows are merged and yielded one chunk at a time.
+    Memory is bounded by the chunk size and the number of distinct proportion keys, not by the row counts
+    :param data_path: Battery retirement workbook
+    :param proportion_data_path: Recycling process proportions by year and city
+    :param chunk_size: Rows per chunk
+    :param methods: Proportion columns to merge
+    :return: Generator of merged chunks, see merge_proportions
+    """
+    proportion_lookup = read_proportion_array(proportion_data_path, methods, chunk_size)
+    for chunk in iter_workbook_chunks(data_path, chunk_size=chunk_size):
+        yield merge_proportions(chunk, methods=methods, proportion_lookup=proportion_lookup)
+
+
+# Load the LCA workbooks
+def load_lca_tables(lca_data_paths=LCA_DATA_PATHS):
+    """
+    :param lca_data_paths: Dictionary {LCA name: workbook path}
+    :return: Dictionary {LCA name: LCA table with stripped 'Province'}
+    """
+    lca_tables = {}
+    for name, path in lca_data_paths.items():
+        lca_df = read_input_table(path)
+        lca_df['Province'] = lca_df['Province'].str.strip()
+        lca_tables[name] = lca_df
+    return lca_tables
+
+
+# Build the LCA tensors shared by all scenarios
+def build_scenario_lca(lca_tables, methods, impacts, years, pathways=LCA_PATHWAYS,
+                       start_year=LCA_TRANSITION_START_YEAR, end_year=LCA_TRANSITION_END_YEAR,
+                       curve=LCA_TRANSITION_CURVE):
+    """
+    :param lca_tables: Dictionary {LCA name: LCA table (from load_lca_tables) or workbook path (memoized, see
+                       load_lca_tensor)}, including 'baseline'
+    :param methods: Recycling methods, in kernel order
+    :param impacts: Impact categories, in output order
+    :param years: Years of the retirement data
+    :param pathways: LCA names reached by a transition from the baseline, see build_interpolated_lca_cube
+    :param start_year: First year with a share of the transition
+    :param end_year: First year after the transition
+    :param curve: Transition curve, see transition_weights
+    :return: Dictionary {LCA name: (provinces Index, LCA tensor, years Index or None)}; pathways have
+             year × province × method × impact tensors, all other tables province × method × impact tensors
+    """
+    scenario_lca = {name: _lca_tensor(table, methods, impacts) + (None,)
+                    for name, table in lca_tables.items() if name not in pathways}
+    if pathways:
+        provinces, lca_years, lca_cube = interpolate_lca_tensors(
+            scenario_lca['baseline'][:2], [_lca_tensor(lca_tables[pathway], methods, impacts) for pathway in pathways],
+            years, start_year, end_year, curve)
+        for pathway, pathway_lca in zip(pathways, lca_cube):
+            scenario_lca[pathway] = (provinces, pathway_lca, lca_years)
+    return scenario_lca
+
+
+# Place arrays in shared memory once
+def share_arrays(arrays):
+    """
+    Copy every array of a dictionary into its own shared memory block; other values are passed on as they are
+    :param arrays: Dictionary {name: array or small value}
+    :return: Tuple of (shared memory blocks, spec for attach_arrays); the caller closes and unlinks the blocks
+    """
+    blocks, spec = [], {}
+    for name, value in arrays.items():
+        if isinstance(value, np.ndarray) and value.nbytes > 0:
+            block = shared_memory.SharedMemory(create=True, size=value.nbytes)
+            np.ndarray(value.shape, value.dtype, buffer=block.buf)[...] = value
+            blocks.append(block)
+            spec[name] = ('shared', block.name, value.shape, value.dtype.str)
+        else:
+            spec[name] = ('value', value)
+    return blocks, spec
+
+
+# Attach to the arrays of share_arrays without copying
+def attach_arrays(spec):
+    """
+    :param spec: Spec from share_arrays
+    :return: Tuple of (attached shared memory blocks, dictionary {name: array view or value}); drop the views
+             before closing the blocks
+    """
+    blocks, arrays = [], {}
+    for name, entry in spec.items():
+        if entry[0] == 'shared':
+            _, block_name, shape, dtype = entry
+            block = shared_memory.SharedMemory(name=block_name)
+            blocks.append(block)
+            arrays[name] = np.ndarray(shape, dtype, buffer=block.buf)
+        else:
+            arrays[name] = entry[1]
+    return blocks, arrays
+
+
+# Scenario entries that are not options of calculate_impact_arrays (proportion sums are checked by
+# validate_scenario_inputs before the kernel passes)
+SCENARIO_FIELDS = ['scenario', 'variants', 'lca', 'efficiency', 'transfers', 'sum_tolerance']
+
+
+# Compile demand-side scenarios into parameter arrays
+def compile_scenarios(scenarios=DEMAND_SCENARIOS, recovery_efficiency=RECOVERY_EFFICIENCY,
+                      methods=SIMULATION_METHODS, metals=METALS):
+    """
+    Cached per definition, so repeated runs (e.g. one per streamed chunk) share the same read-only arrays
+    :param scenarios: Demand-side scenarios, see DEMAND_SCENARIOS
+    :param recovery_efficiency: Dictionary {efficiency table: {method: {metal: efficiency}}}
+    :param methods: Recycling methods, in kernel order
+    :param metals: Recovered metals, in output order
+    :return: List of dictionaries, one per scenario: 'scenario', 'lca', 'variants' (names), 'ratios' (array),
+             'efficiency' (method × metal matrix), 'shift' (method × method matrix or None) and 'options'
+             (remaining keyword arguments of calculate_impact_arrays)
+    """
+    key = json.dumps([scenarios, recovery_efficiency, list(methods), list(metals)])
+    return _compile_scenarios(key)
+
+
+@lru_cache(maxsize=None)
+def _compile_scenarios(key):
+    scenarios, recovery_efficiency, methods, metals = json.loads(key)
+    efficiency = {name: build_efficiency_matrix(table, methods, metals) for name, table in recovery_efficiency.items()}
+    compiled = []
+    for scenario in scenarios:
+        entry = {
+            'scenario': scenario['scenario'],
+            'lca': scenario['lca'],
+            'variants': list(scenario['variants']),
+            'ratios': np.array(list(scenario['variants'].values()), dtype=float),
+            'efficiency': efficiency[scenario['efficiency']],
+            'shift': build_shift_matrix(methods, scenario['transfers']) if scenario.get('transfers') else None,
+            'options': {key: value for key, value in scenario.items() if key not in SCENARIO_FIELDS},
+        }
+        for array in [entry['ratios'], entry['efficiency'], entry['shift']]:
+            if array is not None:
+                array.setflags(write=False)
+        compiled.append(entry)
+    return compiled
+
+
+# One kernel pass of a demand-side scenario
+def run_scenario_kernel(arrays, scenario, methods, lca_provinces, lca_years, metal_content):
+    """
+    :param arrays: Row arrays from encode_simulation_rows and the LCA tensors as 'lca <LCA name>'
+    :param scenario: Compiled demand-side scenario, see compile_scenarios
+    :param methods: Recycling methods, in kernel order
+    :param lca_provinces: Provinces of the scenario's LCA tensor
+    :param lca_years: Years of the scenario's LCA tensor (None for a province × method × impact tensor)
+    :param metal_content: Battery type × metal content matrix in kg/kWh
+    :return: Tuple of (impacts of shape variant × row × impact, metals of shape variant × row × metal)
+    """
+    return calculate_row_impacts(arrays, methods, lca_provinces, arrays[f"lca {scenario['lca']}"],
+                                 scenario['efficiency'], metal_content, scenario['ratios'], scenario['shift'],
+                                 lca_years=lca_years, **scenario['options'])
+
+
+# Worker of the process pool: attach to the shared inputs and run one scenario
+def _run_shared_scenario(spec, task):
+    blocks, arrays = attach_arrays(spec)
+    try:
+        return run_scenario_kernel(arrays, *task)
+    finally:
+        arrays.clear()  # Release the views before closing the blocks
+        for block in blocks:
+            block.close()
+
+
+# Run all supply × demand scenario combinations
+def run_simulation_scenarios(scenarios=DEMAND_SCENARIOS, df=None, lca_tables=None, methods=SIMULATION_METHODS,
+                             impacts=IMPACTS, metals=METALS, workers=SIMULATION_WORKERS, scenario_lca=None,
+                             validate=True, fail_fast=VALIDATION_FAIL_FAST, recovery_efficiency=RECOVERY_EFFICIENCY,
+                             lca_transition=None):
+    """
+    Evaluate every demand-side scenario on the retirement rows of all supply-side scenarios. Inputs are loaded
+    and merged once, and the LCA tensors and efficiency matrices are shared by all scenarios; each scenario
+    entry is one kernel pass over all its variants. With several workers the scenario entries fan out over a
+    process pool: the row arrays and LCA tensors are placed in shared memory once and the workers attach to
+    them without copying. The results do not depend on the number of workers.
+    :param scenarios: Demand-side scenarios, see DEMAND_SCENARIOS
+    :param df: Merged retirement rows (from load_simulation_inputs, loaded here when omitted)
+    :param lca_tables: LCA tables (from load_lca_tables; when omitted the tables are loaded for validation and the
+                       tensors come from load_lca_tensor)
+    :param methods: Recycling methods, in kernel order
+    :param impacts: Impact categories, in output order
+    :param metals: Recovered metals, in output order
+    :param workers: Number of worker processes (None for one per CPU core, 1 to run in this process)
+    :param scenario_lca: LCA tensors from build_scenario_lca (built from lca_tables when omitted)
+    :param validate: Validate the inputs once before the kernel passes and print the failed checks
+    :param fail_fast: Raise a ValueError when a check fails, see validate_scenario_inputs
+    :param recovery_efficiency: Efficiency tables named by the scenarios, see compile_scenarios
+    :param lca_transition: Keyword arguments of build_scenario_lca ('pathways', 'start_year', 'end_year',
+                           'curve'), e.g. the 'lca_transition' of load_scenario_definitions (None for the defaults)
+    :return: DataFrame with categorical 'Demand scenario' and 'Variant', int 'Year', the remaining RESULT_KEYS,
+             the impacts and the metals; one block of rows per scenario and variant, in scenario list order
+    """
+    if df is None:
+        df = load_simulation_inputs()
+    if validate:
+        validation_tables = load_lca_tables() if lca_tables is None and scenario_lca is None else lca_tables
+        print_validation_report(validate_scenario_inputs(df, scenarios, validation_tables, methods, impacts,
+                                                         fail_fast))
+
+    # Shared row arrays, LCA tensors (memoized per workbook unless tables are given), compiled scenario
+    # parameters and the metal content matrix
+    arrays = encode_simulation_rows(df, methods)
+    if scenario_lca is None:
+        scenario_lca = build_scenario_lca(LCA_DATA_PATHS if lca_tables is None else lca_tables, methods, impacts,
+                                          sorted(np.unique(arrays['year'])), **(lca_transition or {}))
+    arrays.update({f'lca {name}': lca for name, (_, lca, _) in scenario_lca.items()})
+    compiled = compile_scenarios(scenarios, recovery_efficiency, methods, metals)
+    metal_content = build_metal_content_matrix(BATTERY_METAL_CONTENT, metals=metals)
+
+    tasks = [(scenario, methods, scenario_lca[scenario['lca']][0], scenario_lca[scenario['lca']][2], metal_content)
+             for scenario in compiled]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        outputs = [run_scenario_kernel(arrays, *task) for task in tasks]
+    else:
+        blocks, spec = share_arrays(arrays)
+        try:
+            # map keeps the scenario order, so the output is independent of the worker count
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                outputs = list(executor.map(partial(_run_shared_scenario, spec), tasks))
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    results = []
+    for scenario, (impact_totals, total_metals) in zip(compiled, outputs):
+        for variant, variant_impacts, variant_metals in zip(scenario['variants'], impact_totals, total_metals):
+            variant_df = impact_results_frame(df, impacts, variant_impacts, variant_metals, metals)
+            variant_df.insert(0, 'Variant', variant)
+            variant_df.insert(0, 'Demand scenario', scenario['scenario'])
+            results.append(variant_df)
+
+    results_df = pd.concat(results, ignore_index=True)
+    results_df['Year'] = results_df['Year'].astype(int)
+    for column in ['Demand scenario', 'Variant']:
+        results_df[column] = pd.Categorical(results_df[column], categories=pd.unique(results_df[column]))
+    return results_df
+
+
+# Run all scenarios chunk by chunk with bounded memory
+def stream_simulation_scenarios(chunks, scenarios=DEMAND_SCENARIOS, lca_tables=None, methods=SIMULATION_METHODS,
+                                impacts=IMPACTS, metals=METALS, workers=1, fail_fast=VALIDATION_FAIL_FAST,
+                                recovery_efficiency=RECOVERY_EFFICIENCY, lca_transition=None):
+    """
+    Evaluate run_simulation_scenarios on each chunk of merged retirement rows; each chunk is validated before its
+    kernel passes, and the LCA tensors are built once per distinct set of chunk years
+    :param chunks: Iterable of merged retirement rows, e.g. from iter_simulation_inputs
+    :param scenarios: Demand-side scenarios, see DEMAND_SCENARIOS
+    :param lca_tables: LCA tables (from load_lca_tables, loaded here when omitted)
+    :param methods: Recycling methods, in kernel order
+    :param impacts: Impact categories, in output order
+    :param metals: Recovered metals, in output order
+    :param workers: Number of worker processes per chunk
+    :param fail_fast: Raise a ValueError when a check of a chunk fails, see validate_scenario_inputs
+    :param recovery_efficiency: Efficiency tables named by the scenarios, see compile_scenarios
+    :param lca_transition: Keyword arguments of build_scenario_lca, see run_simulation_scenarios
+    :return: Generator of result frames, one per chunk, see run_simulation_scenarios
+    """
+    lca_sources = LCA_DATA_PATHS if lca_tables is None else lca_tables
+    if lca_tables is None:
+        lca_tables = load_lca_tables()
+    scenario_lca = {}
+    for chunk in chunks:
+        years = tuple(sorted(pd.to_numeric(chunk['Year']).unique()))
+        if years not in scenario_lca:
+            scenario_lca[years] = build_scenario_lca(lca_sources, methods, impacts, years, **(lca_transition or {}))
+        yield run_simulation_scenarios(scenarios, chunk, lca_tables, methods, impacts, metals, workers,
+                                       scenario_lca[years], fail_fast=fail_fast,
+                                       recovery_efficiency=recovery_efficiency)
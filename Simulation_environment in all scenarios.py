@@ -0,0 +1,54 @@
+from Output_data_sink import ResultSink
+from Output_rollup_cube import ROLLUP_DIMENSIONS, RollupCube, rollup_cube_path
+from Simulation_engine import (
+    iter_simulation_inputs, load_lca_tables, load_simulation_inputs, print_validation_report,
+    run_simulation_scenarios, stream_simulation_scenarios, validate_scenario_inputs,
+)
+from Simulation_parameters import (
+    IMPACTS, SIMULATION_OUTPUT_FORMATS, SIMULATION_OUTPUT_PATH, SIMULATION_WORKERS, VALIDATION_FAIL_FAST,
+)
+
+# Battery retirement data: False reads the simulation input workbook, True aggregates the EOL engine results in memory
+build_from_eol_engine = False
+
+# Inputs: False loads the whole workbooks, True streams them in chunks of SIMULATION_CHUNK_SIZE rows
+# (for county-level or monthly inputs; results are then written chunk by chunk)
+stream_inputs = False
+
+if __name__ == '__main__':
+    indicators = IMPACTS + ['lithium', 'nickel', 'cobalt', 'manganese']
+    group_keys = ['Demand scenario', 'Variant', 'Scenario']
+
+    # Rollup cube (scenario × variant × year × province × battery type × indicator) filled alongside the results
+    cube = RollupCube({dimension: [] for dimension in ROLLUP_DIMENSIONS}, indicators)
+
+    with ResultSink(SIMULATION_OUTPUT_PATH, SIMULATION_OUTPUT_FORMATS) as sink:
+        if stream_inputs:
+            # Evaluate all supply × demand scenarios chunk by chunk and append each chunk to the results
+            for results_df in stream_simulation_scenarios(iter_simulation_inputs(), workers=SIMULATION_WORKERS):
+                sink.write('Results', results_df)
+                cube.add(results_df)
+        else:
+            # Load and merge the inputs once and validate them
+            df = load_simulation_inputs(build_from_eol_engine=build_from_eol_engine)
+            lca_tables = load_lca_tables()
+            report = validate_scenario_inputs(df, lca_tables=lca_tables, fail_fast=VALIDATION_FAIL_FAST)
+            print_validation_report(report)
+            sink.write('Validation', report)
+
+            # Evaluate all supply × demand scenarios
+            results_df = run_simulation_scenarios(df=df, lca_tables=lca_tables, workers=SIMULATION_WORKERS,
+                                                  validate=False)
+
+            # Save the scenario-indexed results
+            sink.write('Results', results_df)
+            cube.add(results_df)
+
+    # Save the rollup cube next to the detailed results
+    cube_path = cube.save(rollup_cube_path(SIMULATION_OUTPUT_PATH))
+
+    # Output the total value of each indicator per demand-side scenario
+    totals = cube.to_frame(group_keys)
+    print(f"Evaluated {len(totals)} scenario combinations")
+    print(totals[['Global warming (GWP100a)', 'lithium']])
+    print("Result file paths:", sink.paths + [cube_path])
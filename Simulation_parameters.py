@@ -0,0 +1,72 @@
+from Simulation_scenarios import load_scenario_definitions
+
+# Simulation inputs (relative paths)
+SIMULATION_DATA_PATH = './input data/EOL LFP and NCM battery.xlsx'
+PROPORTION_DATA_PATH = './input data/Proportion of recycling technologies under BS.xlsx'
+LCA_DATA_PATHS = {
+    'baseline': './input data/LCA data.xlsx',
+    'secondary use': './input data/LCA data includes secondary-use technology.xlsx',
+    'SSP1': './input data/LCA data about ES1.xlsx',
+    'SSP2': './input data/LCA data about ES2.xlsx',
+    'SSP3': './input data/LCA data about ES3.xlsx',
+}
+
+# Recycling processes of the proportion data
+RECYCLING_METHODS = [
+    'Outdated Pyrometallurgical Recovery NCM', 'Outdated Pyrometallurgical Recovery LFP',
+    'Outdated Hydrometallurgical Recovery NCM', 'Hydrometallurgical Recovery NCM',
+    'Hydrometallurgical Recovery LFP', 'Pyro-Hydrometallurgical Recovery NCM',
+]
+
+# Secondary use of each battery type (SU scenario)
+SECOND_USE_METHODS = {'LFP': 'Secondary Use LFP', 'NCM': 'Secondary Use NCM'}
+SIMULATION_METHODS = RECYCLING_METHODS + list(SECOND_USE_METHODS.values())
+
+# Impact categories
+IMPACTS = [
+    'Abiotic depletion', 'Abiotic depletion (fossil fuels)', 'Acidification',
+    'Eutrophication', 'Fresh water aquatic ecotox.', 'Global warming (GWP100a)',
+    'Human toxicity', 'Marine aquatic ecotoxicity', 'Ozone layer depletion (ODP)',
+    'Photochemical oxidation', 'Terrestrial ecotoxicity'
+]
+
+# Battery metal content (unit: kg/kWh)
+BATTERY_METAL_CONTENT = {
+    'LFP': {'lithium': 0.106, 'nickel': 0, 'cobalt': 0, 'manganese': 0},
+    'NCM': {'lithium': 0.109879, 'nickel': 0.6, 'cobalt': 0.23475, 'manganese': 0.24},
+}
+
+# Demand-side scenario definitions: recovery efficiency tables, proportion shifts, LCA pathways, ratios and
+# year cutoffs. Together with the 4 supply-side scenarios of the retirement data (BS, TP, ED, LE) they form
+# 52 scenarios; edit the file (or point this path to another one) to run new variants.
+SCENARIO_DEFINITIONS_PATH = './Simulation_scenarios.toml'
+SCENARIO_DEFINITIONS = load_scenario_definitions(
+    SCENARIO_DEFINITIONS_PATH, SIMULATION_METHODS,
+    {metal for content in BATTERY_METAL_CONTENT.values() for metal in content}, list(LCA_DATA_PATHS))
+
+# Recovery efficiency of each process: {'baseline': ..., 'optimized': ... (TO scenario)}
+RECOVERY_EFFICIENCY = SCENARIO_DEFINITIONS['recovery_efficiency']
+
+# LCA data reached at the end of a transition from the baseline LCA data (ES scenario)
+LCA_PATHWAYS = SCENARIO_DEFINITIONS['lca_transition']['pathways']
+LCA_TRANSITION_START_YEAR = SCENARIO_DEFINITIONS['lca_transition']['start_year']
+LCA_TRANSITION_END_YEAR = SCENARIO_DEFINITIONS['lca_transition']['end_year']
+LCA_TRANSITION_CURVE = SCENARIO_DEFINITIONS['lca_transition']['curve']
+
+# Demand-side scenarios: each entry is one kernel pass, its variants map a name to the shift ratio
+DEMAND_SCENARIOS = SCENARIO_DEFINITIONS['scenarios']
+
+# Worker processes of the scenario runs (None for one per CPU core, 1 to run in a single process)
+SIMULATION_WORKERS = None
+
+# Rows per chunk when the inputs are streamed
+SIMULATION_CHUNK_SIZE = 100000
+
+# Raise on failed input checks instead of printing them (see validate_simulation_inputs)
+VALIDATION_FAIL_FAST = False
+
+# Output formats of the simulation results: any of 'parquet' and 'arrow' (one file per sheet) and 'excel'
+SIMULATION_OUTPUT_FORMATS = ['parquet']
+
+# Scenario-indexed store of all simulation results
+SIMULATION_OUTPUT_PATH = './output data_simulation/Environmental impact and metal recovery results in all scenarios.xlsx'
@@ -0,0 +1,166 @@
+try:
+    import tomllib
+except ModuleNotFoundError:  # Python < 3.11
+    import tomli as tomllib
+
+# Options of a scenario entry passed on to the kernel, with their accepted types
+SCENARIO_OPTIONS = {
+    'shift_from_year': int,
+    'renormalize': bool,
+    'weight_factor': (int, float),
+    'check_capacity': bool,
+    'sum_tolerance': (int, float),
+    'replacement_methods': dict,
+}
+
+# Keys of a scenario entry besides its options
+SCENARIO_KEYS = ['name', 'variants', 'ratios', 'lca', 'efficiency', 'transfers']
+
+
+# Read a scenario definition file
+def read_scenario_file(path):
+    """
+    :param path: TOML file with [efficiency.<name>], [transfers], [lca_transition] and [[scenario]] tables
+    :return: Dictionary of the parsed file
+    """
+    with open(path, 'rb') as file:
+        return tomllib.load(file)
+
+
+# Check the types and ranges of the scenario definitions
+def check_scenario_definitions(definitions, methods, metals, lca_names=None):
+    """
+    :param definitions: Dictionary from read_scenario_file
+    :param methods: Recycling methods every efficiency table must cover
+    :param metals: Recovered metals
+    :param lca_names: Names of the available LCA data (None to accept any name)
+    :return: List of error messages, empty if the definitions are valid
+    """
+    errors = []
+    for key in ['efficiency', 'transfers', 'lca_transition', 'scenario']:
+        if key not in definitions:
+            errors.append(f"Missing table [{key}]")
+    efficiency = definitions.get('efficiency', {})
+    transfers = definitions.get('transfers', {})
+
+    # Efficiency tables: every method, shares in [0, 1]
+    for name, table in efficiency.items():
+        for method in methods:
+            if method not in table:
+                errors.append(f"Efficiency table '{name}' has no row for '{method}'")
+        for method, row in table.items():
+            if method not in methods:
+                errors.append(f"Efficiency table '{name}' has an unknown method '{method}'")
+            for metal, value in row.items():
+                if metal not in metals:
+                    errors.append(f"Efficiency table '{name}', '{method}' has an unknown metal '{metal}'")
+                elif not isinstance(value, (int, float)) or not 0 <= value <= 1:
+                    errors.append(f"Efficiency table '{name}', '{method}', {metal} = {value!r} is not within [0, 1]")
+
+    # Transfers: (source, target) pairs of known methods
+    for name, pairs in transfers.items():
+        for pair in pairs:
+            if len(pair) != 2 or any(method not in methods for method in pair):
+                errors.append(f"Transfers '{name}' has an invalid pair {pair!r}")
+
+    # LCA transition
+    transition = definitions.get('lca_transition', {})
+    if transition:
+        if not transition.get('start_year', 0) < transition.get('end_year', 0):
+            errors.append("LCA transition start_year must lie before end_year")
+        unknown = [pathway for pathway in transition.get('pathways', []) if lca_names and pathway not in lca_names]
+        if unknown:
+            errors.append(f"LCA transition has unknown pathways {unknown}")
+
+    # Scenarios
+    for entry in definitions.get('scenario', []):
+        label = f"Scenario '{entry.get('name')}'"
+        for key in ['name', 'lca', 'efficiency']:
+            if key not in entry:
+                errors.append(f"{label} has no '{key}'")
+        for key, value in entry.items():
+            if key in SCENARIO_OPTIONS:
+                if not isinstance(value, SCENARIO_OPTIONS[key]) or \
+                        (SCENARIO_OPTIONS[key] is not bool and isinstance(value, bool)):
+                    errors.append(f"{label} option {key} = {value!r} has the wrong type")
+            elif key not in SCENARIO_KEYS:
+                errors.append(f"{label} has an unknown key '{key}'")
+        if ('variants' in entry) == ('ratios' in entry) and not isinstance(entry.get('lca'), list):
+            errors.append(f"{label} needs either 'variants' or 'ratios'")
+        ratios = list(entry.get('variants', {}).values()) + list(entry.get('ratios', []))
+        if any(not isinstance(ratio, (int, float)) or not 0 <= ratio <= 1 for ratio in ratios):
+            errors.append(f"{label} has ratios outside [0, 1]: {ratios}")
+        lca = entry.get('lca', [])
+        unknown = [name for name in (lca if isinstance(lca, list) else [lca]) if lca_names and name not in lca_names]
+        if unknown:
+            errors.append(f"{label} has unknown LCA data {unknown}")
+        if 'efficiency' in entry and entry['efficiency'] not in efficiency:
+            errors.append(f"{label} has an unknown efficiency table '{entry['efficiency']}'")
+        if 'transfers' in entry and entry['transfers'] not in transfers:
+            errors.append(f"{label} has unknown transfers '{entry['transfers']}'")
+        for battery_type, method in entry.get('replacement_methods', {}).items():
+            if method not in methods:
+                errors.append(f"{label} replaces {battery_type} with an unknown method '{method}'")
+    return errors
+
+
+# Expand the scenario entries into kernel passes
+def expand_scenarios(definitions):
+    """
+    :param definitions: Checked scenario definitions
+    :return: List of demand-side scenarios {'scenario', 'variants' {name: ratio}, 'lca', 'efficiency',
+             'transfers' [(source, target), ...] and the options}; an entry with a list of LCA data gives one
+             scenario per LCA data, with a single variant named after it
+    """
+    scenarios = []
+    for entry in definitions['scenario']:
+        scenario = {'scenario': entry['name'], 'lca': entry['lca'], 'efficiency': entry['efficiency']}
+        if 'ratios' in entry:
+            scenario['variants'] = {str(ratio): ratio for ratio in entry['ratios']}
+        elif 'variants' in entry:
+            scenario['variants'] = dict(entry['variants'])
+        if 'transfers' in entry:
+            scenario['transfers'] = [tuple(pair) for pair in definitions['transfers'][entry['transfers']]]
+        scenario.update({key: value for key, value in entry.items() if key in SCENARIO_OPTIONS})
+
+        if isinstance(entry['lca'], list):
+            scenarios += [{**scenario, 'lca': lca, 'variants': scenario.get('variants', {lca: 0})}
+                          for lca in entry['lca']]
+        else:
+            scenarios.append(scenario)
+    return scenarios
+
+
+# Load the scenario definitions of a file
+def load_scenario_definitions(path, methods, metals, lca_names=None):
+    """
+    Read, check and expand a scenario definition file
+    :param path: TOML scenario definition file, e.g. Simulation_scenarios.toml
+    :param methods: Recycling methods every efficiency table must cover
+    :param metals: Recovered metals
+    :param lca_names: Names of the available LCA data (None to accept any name)
+    :return: Dictionary {'recovery_efficiency': {table: {method: {metal: efficiency}}},
+             'lca_transition': {'pathways', 'start_year', 'end_year', 'curve'}, 'scenarios': see expand_scenarios}
+    """
+    definitions = read_scenario_file(path)
+    errors = check_scenario_definitions(definitions, methods, metals, lca_names)
+    if errors:
+        raise ValueError(f"Invalid scenario definitions in {path}:\n" + '\n'.join(errors))
+    return {
+        'recovery_efficiency': definitions['efficiency'],
+        'lca_transition': definitions['lca_transition'],
+        'scenarios': expand_scenarios(definitions),
+    }
+
+
+# Entries of one demand-side scenario
+def select_scenario(scenarios, name):
+    """
+    :param scenarios: Demand-side scenarios, see expand_scenarios
+    :param name: Scenario name, e.g. 'AR'
+    :return: List of the entries of the scenario (one per LCA data for an entry with a list of LCA data)
+    """
+    entries = [scenario for scenario in scenarios if scenario['scenario'] == name]
+    if not entries:
+        raise ValueError(f"Unknown demand-side scenario: {name}")
+    return entries
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The engines are top-level modules that read their parameter files by paths relative to the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
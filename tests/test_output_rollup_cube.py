@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Output_rollup_cube import ROLLUP_DIMENSIONS, RollupCube, build_rollup_cube, load_rollup_cube, rollup_cube_path
+
+INDICATORS = ['Global warming (GWP100a)', 'lithium']
+
+
+# Detailed results of 2 demand-side scenarios over 3 cities
+@pytest.fixture
+def results_df():
+    rng = np.random.default_rng(5)
+    rows = pd.DataFrame([
+        {'Demand scenario': demand, 'Variant': variant, 'Scenario': scenario, 'Year': year, 'City': city,
+         'Province': province, 'Battery type': battery_type}
+        for demand, variant in [('BS', 'Baseline'), ('AR', '0.2'), ('AR', '0.4')] for scenario in ['BS', 'LE']
+        for year in range(2020, 2031) for city, province in [('A', 'X'), ('B', 'X'), ('C', 'Y')]
+        for battery_type in ['LFP', 'NCM']
+    ])
+    for indicator in INDICATORS:
+        rows[indicator] = rng.uniform(0, 10, len(rows))
+    return rows
+
+
+def test_queries_match_the_detailed_results(results_df):
+    cube = build_rollup_cube(results_df, INDICATORS)
+    selected = results_df[(results_df['Demand scenario'] == 'AR') & (results_df['Variant'] == '0.4') &
+                          (results_df['Year'] == 2025) & (results_df['Province'] == 'X')]
+
+    # Scalar labels select a cell, unselected dimensions are kept, label lists are taken in order
+    cell = cube.query({'Demand scenario': 'AR', 'Variant': '0.4', 'Scenario': 'LE', 'Year': 2025,
+                       'Province': 'X', 'Battery type': 'NCM'}, 'lithium')
+    assert cell == pytest.approx(selected.loc[(selected['Scenario'] == 'LE') &
+                                              (selected['Battery type'] == 'NCM'), 'lithium'].sum())
+    by_scenario = cube.query({'Demand scenario': 'AR', 'Variant': '0.4', 'Year': 2025, 'Province': 'X'}, 'lithium')
+    expected = selected.groupby(['Scenario', 'Battery type'])['lithium'].sum().unstack()
+    np.testing.assert_allclose(by_scenario, expected.loc[['BS', 'LE'], ['LFP', 'NCM']].to_numpy())
+    assert cube.query({'Year': [2030, 2020], 'Province': 'Y'}).shape == (2, 3, 2, 2, 2, len(INDICATORS))
+
+    # Totals keep only the combinations present in the results
+    totals = cube.to_frame(['Demand scenario', 'Variant'])
+    expected = results_df.groupby(['Demand scenario', 'Variant'], sort=False)[INDICATORS].sum()
+    assert len(totals) == 3
+    np.testing.assert_allclose(totals.loc[expected.index].to_numpy(), expected.to_numpy())
+    with pytest.raises(ValueError):
+        cube.query({'Province': 'Z'})
+
+
+def test_string_years_are_integer_labels(results_df, tmp_path):
+    results_df['Year'] = results_df['Year'].astype(str)
+    cube = build_rollup_cube(results_df, INDICATORS, ['Year', 'Battery type'])
+    expected = results_df[results_df['Year'] == '2025'].groupby('Battery type')[INDICATORS].sum()
+    np.testing.assert_allclose(cube.query({'Year': 2025}), expected.to_numpy())
+
+    # The saved cube keeps the integer years
+    path = cube.save(rollup_cube_path(str(tmp_path / 'results.xlsx')))
+    np.testing.assert_allclose(load_rollup_cube(path).query({'Year': 2025}), expected.to_numpy())
+    with pytest.raises(ValueError):
+        cube.query({'Year': '2025'})
+
+
+def test_chunks_accumulate_into_one_cube(results_df):
+    cube = RollupCube({dimension: [] for dimension in ROLLUP_DIMENSIONS}, INDICATORS)
+    for start in range(0, len(results_df), 100):
+        cube.add(results_df.iloc[start:start + 100])
+    expected = build_rollup_cube(results_df, INDICATORS)
+    pd.testing.assert_frame_equal(cube.to_frame().sort_index(), expected.to_frame().sort_index())
+    assert cube.counts.sum() == len(results_df)
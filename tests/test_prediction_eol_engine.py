@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import weibull_min
+
+from Prediction_EOL_engine import (
+    aggregate_battery_types, calculate_retired_counts, calculate_scenario_counts, load_tp_proportion,
+    retirement_cdf_tensor, update_scenario_counts,
+)
+from Prediction_EOL_parameters import BATTERY_TYPE_OF_CHEMISTRY, VEHICLE_CLASSES
+
+CITIES = ['City A', 'City B', 'City C']
+PROVINCES = {'City A': 'Province X', 'City B': 'Province X', 'City C': 'Province Y'}
+
+
+# Sales of the 3 test cities
+@pytest.fixture
+def sales():
+    rng = np.random.default_rng(0)
+    sales_years = np.arange(2016, 2031)
+    return rng.uniform(0, 1000, (len(CITIES), len(sales_years))), sales_years
+
+
+def test_retired_counts_match_weibull_loop(sales):
+    sales, sales_years = sales
+    params = VEHICLE_CLASSES['PEV']
+    models = list(params['weibull_params'])
+    years = params['years']
+    counts = calculate_retired_counts(sales, retirement_cdf_tensor(years, sales_years, models,
+                                                                   params['weibull_params']))
+
+    expected = np.zeros((len(CITIES), len(years), len(models)))
+    for c in range(len(CITIES)):
+        for y, year in enumerate(years):
+            for m, model in enumerate(models):
+                weibull = params['weibull_params'][model]
+                expected[c, y, m] = sum(
+                    sales[c, s] * weibull_min.cdf(year - sales_year, weibull['shape'], scale=weibull['scale'])
+                    for s, sales_year in enumerate(sales_years) if year > sales_year
+                )
+    np.testing.assert_allclose(counts, expected, rtol=1e-12)
+
+
+def test_battery_types_sum_the_models():
+    rng = np.random.default_rng(3)
+    results = {}
+    for vehicle_class in ['PEV', 'CEV']:
+        models = list(VEHICLE_CLASSES[vehicle_class]['weibull_params'])
+        results[('BS', vehicle_class)] = pd.DataFrame([
+            {'City': city, 'Year': year, 'Battery type': model}
+            for city in CITIES for year in range(2020, 2031) for model in models
+        ]).assign(**{'Weight (thousand t)': lambda df: rng.uniform(0, 1, len(df)),
+                     'Capacity (GWh)': lambda df: rng.uniform(0, 1, len(df))})
+    predictions = pd.DataFrame({'City': CITIES, 'Province': [PROVINCES[city] for city in CITIES]})
+    inputs = {vehicle_class: {'predictions': predictions} for vehicle_class in ['PEV', 'CEV']}
+    battery_type_df = aggregate_battery_types(results, inputs)
+
+    models_df = pd.concat(results.values())
+    assert models_df['Battery type'].nunique() == 24  # 12 models per vehicle class
+    models_df['Battery type'] = [BATTERY_TYPE_OF_CHEMISTRY[model.split('_', 1)[1]]
+                                 for model in models_df['Battery type']]
+    expected = models_df.groupby(['City', 'Year', 'Battery type'])[['Weight (thousand t)', 'Capacity (GWh)']].sum()
+    totals = battery_type_df.set_index(['City', 'Year', 'Battery type'])[expected.columns].loc[expected.index]
+    np.testing.assert_allclose(totals.to_numpy(), expected.to_numpy(), rtol=1e-12)
+    assert (battery_type_df['Province'] == battery_type_df['City'].map(PROVINCES)).all()
+
+
+def test_incremental_counts_match_a_full_recompute(sales, tmp_path):
+    sales, sales_years = sales
+    params = VEHICLE_CLASSES['PEV']
+    predictions = pd.DataFrame([{'City': city, 'Year': year, 'PEV_number': sales[c, s]}
+                                for c, city in enumerate(CITIES) for s, year in enumerate(sales_years)])
+    tp_proportion = load_tp_proportion(params['tp_proportion_path'], params['vehicle_proportion'], params['years'])
+    combinations = [('BS', 'PEV'), ('LE', 'PEV'), ('TP', 'PEV')]
+
+    def check(predictions):
+        inputs = {'PEV': {'predictions': predictions, 'tp_proportion': tp_proportion}}
+        updated = update_scenario_counts(combinations, inputs, cities_per_block=2, state_dir=tmp_path)
+        for combination, (cities, years, models, counts, _) in calculate_scenario_counts(combinations, inputs).items():
+            assert updated[combination][:3] == (cities, years, models)
+            np.testing.assert_allclose(updated[combination][3], counts, rtol=1e-10, atol=1e-9)
+
+    # First run without a saved state, then changed sales from 2025 on, a new city and a dropped city
+    check(predictions)
+    predictions.loc[(predictions['City'] == 'City B') & (predictions['Year'] >= 2025), 'PEV_number'] *= 1.5
+    new_city = predictions[predictions['City'] == 'City C'].assign(City='City D',
+                                                                   PEV_number=lambda df: df['PEV_number'] / 3)
+    check(pd.concat([predictions[predictions['City'] != 'City A'], new_city], ignore_index=True))
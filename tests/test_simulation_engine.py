@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Input_data_cache import read_input_table
+from Simulation_engine import (
+    build_efficiency_matrix, build_lca_tensor, build_metal_content_matrix, build_shift_matrix,
+    calculate_impact_arrays, iter_simulation_inputs, merge_proportions,
+)
+from Simulation_parameters import BATTERY_METAL_CONTENT, IMPACTS, RECOVERY_EFFICIENCY, RECYCLING_METHODS
+
+CITIES = ['City A', 'City B', 'City C']
+PROVINCES = {'City A': 'Province X', 'City B': 'Province X', 'City C': 'Province Y'}
+
+
+# Retirement rows of the 3 test cities with proportions of the recycling methods
+@pytest.fixture
+def retirement_rows():
+    rng = np.random.default_rng(1)
+    rows = pd.DataFrame([
+        {'Year': year, 'City': city, 'Province': PROVINCES[city], 'Scenario': 'BS', 'Battery type': battery_type}
+        for city in CITIES for year in range(2020, 2031) for battery_type in ['LFP', 'NCM']
+    ])
+    rows['Weight (thousand t)'] = rng.uniform(0, 2, len(rows))
+    rows['Capacity (GWh)'] = rng.uniform(0, 1, len(rows))
+    for method in RECYCLING_METHODS:
+        rows[method] = rng.uniform(0, 1, len(rows))
+    return rows
+
+
+# LCA tensor of the test provinces
+@pytest.fixture
+def lca():
+    rng = np.random.default_rng(2)
+    lca_df = pd.DataFrame([
+        {'Province': province, 'Impact': impact, **{method: rng.uniform(0, 5) for method in RECYCLING_METHODS}}
+        for province in ['Province X', 'Province Y'] for impact in IMPACTS
+    ])
+    return build_lca_tensor(lca_df, RECYCLING_METHODS, IMPACTS)
+
+
+@pytest.mark.parametrize('negative', [False, True])
+def test_affine_shift_matches_per_ratio_recompute(retirement_rows, lca, negative):
+    if negative:
+        # Amounts that are negative at some ratios only are skipped at those ratios
+        retirement_rows.loc[::5, 'Outdated Pyrometallurgical Recovery NCM'] = -0.4
+        retirement_rows.loc[::7, 'Hydrometallurgical Recovery NCM'] = -0.3
+    lca_provinces, lca = lca
+    efficiency = build_efficiency_matrix(RECOVERY_EFFICIENCY['baseline'], RECYCLING_METHODS)
+    metal_content = build_metal_content_matrix(BATTERY_METAL_CONTENT)
+    transfers = [('Outdated Pyrometallurgical Recovery NCM', 'Hydrometallurgical Recovery NCM'),
+                 ('Outdated Pyrometallurgical Recovery LFP', 'Hydrometallurgical Recovery LFP')]
+    ratios = [0, 0.2, 0.6, 1]
+    impacts, metals = calculate_impact_arrays(retirement_rows, RECYCLING_METHODS, lca_provinces, lca, efficiency,
+                                              metal_content, ratios, build_shift_matrix(RECYCLING_METHODS, transfers),
+                                              shift_from_year=2024)
+
+    for i, ratio in enumerate(ratios):
+        # Shift the proportions of this ratio explicitly and evaluate them without a shift
+        shifted_rows = retirement_rows.copy()
+        from_2024 = shifted_rows['Year'] >= 2024
+        for source, target in transfers:
+            moved = retirement_rows.loc[from_2024, source] * ratio
+            shifted_rows.loc[from_2024, source] -= moved
+            shifted_rows.loc[from_2024, target] += moved
+        expected_impacts, expected_metals = calculate_impact_arrays(shifted_rows, RECYCLING_METHODS, lca_provinces,
+                                                                    lca, efficiency, metal_content)
+        np.testing.assert_allclose(impacts[i], expected_impacts[0], rtol=1e-10, atol=1e-6)
+        np.testing.assert_allclose(metals[i], expected_metals[0], rtol=1e-10, atol=1e-6)
+
+
+def test_streamed_inputs_match_in_memory_merge(retirement_rows, tmp_path):
+    rng = np.random.default_rng(4)
+    proportion_df = pd.DataFrame([
+        {'Year': year, 'Province': PROVINCES[city] + ' ', 'City': city, **dict(zip(RECYCLING_METHODS, rng.dirichlet(
+            np.ones(len(RECYCLING_METHODS)))))}
+        for city in CITIES for year in range(2020, 2031)
+    ])
+    retirement_df = retirement_rows[['Year', 'Province', 'City', 'Scenario', 'Battery type', 'Weight (thousand t)',
+                                     'Capacity (GWh)']]
+    data_path, proportion_data_path = tmp_path / 'retirement.xlsx', tmp_path / 'proportions.xlsx'
+    retirement_df.to_excel(data_path, index=False)
+    proportion_df.to_excel(proportion_data_path, index=False)
+
+    # Both workbooks are read in several chunks; the proportions go to the dense array chunk by chunk
+    chunks = list(iter_simulation_inputs(data_path, proportion_data_path, chunk_size=7))
+    assert len(chunks) == -(-len(retirement_df) // 7)
+    expected = merge_proportions(read_input_table(data_path, cache_dir=tmp_path / 'cache'),
+                                 read_input_table(proportion_data_path, cache_dir=tmp_path / 'cache'))
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), expected)
@@ -0,0 +1,52 @@
+import pytest
+
+from Simulation_engine import METALS
+from Simulation_parameters import LCA_DATA_PATHS, SCENARIO_DEFINITIONS_PATH, SIMULATION_METHODS
+from Simulation_scenarios import (
+    check_scenario_definitions, load_scenario_definitions, read_scenario_file, select_scenario,
+)
+
+
+def load(path):
+    return load_scenario_definitions(path, SIMULATION_METHODS, METALS, list(LCA_DATA_PATHS))
+
+
+def test_repository_definitions_expand_to_13_demand_side_scenarios():
+    definitions = load(SCENARIO_DEFINITIONS_PATH)
+    assert sum(len(scenario['variants']) for scenario in definitions['scenarios']) == 13
+    assert [entry['lca'] for entry in select_scenario(definitions['scenarios'], 'ES')] == ['SSP1', 'SSP2', 'SSP3']
+    ar, = select_scenario(definitions['scenarios'], 'AR')
+    assert ar['variants'] == {'0.2': 0.2, '0.4': 0.4, '0.6': 0.6}
+    assert ar['weight_factor'] == 1e4 and ar['renormalize'] is True
+    assert set(definitions['recovery_efficiency']) == {'baseline', 'optimized'}
+
+
+def test_invalid_definitions_are_reported(tmp_path):
+    with open(SCENARIO_DEFINITIONS_PATH, encoding='utf-8') as file:
+        text = file.read()
+    text = text.replace('lithium = 0.9, manganese = 0.98 }', 'lithium = 1.2, manganese = 0.98 }', 1)
+    text = text.replace('"Outdated Hydrometallurgical Recovery NCM", "Hydrometallurgical Recovery NCM"',
+                        '"Outdated Hydrometallurgical Recovery NCM", "Bioleaching NCM"')
+    text = text.replace('weight_factor = 1e4', 'weight_factor = "1e4"\nshift_year = 2024')
+    text = text.replace('ratios = [0.2, 0.4, 0.6]\nlca = "secondary use"', 'ratios = [0.2, 1.4]\nlca = "SSP4"')
+    path = tmp_path / 'scenarios.toml'
+    path.write_text(text, encoding='utf-8')
+
+    errors = check_scenario_definitions(read_scenario_file(path), SIMULATION_METHODS, METALS, list(LCA_DATA_PATHS))
+    assert errors == [
+        "Efficiency table 'baseline', 'Hydrometallurgical Recovery NCM', lithium = 1.2 is not within [0, 1]",
+        "Transfers 'outdated_processes' has an invalid pair ['Outdated Hydrometallurgical Recovery NCM', "
+        "'Bioleaching NCM']",
+        "Scenario 'AR' option weight_factor = '1e4' has the wrong type",
+        "Scenario 'AR' has an unknown key 'shift_year'",
+        "Scenario 'SU' has ratios outside [0, 1]: [0.2, 1.4]",
+        "Scenario 'SU' has unknown LCA data ['SSP4']",
+    ]
+    with pytest.raises(ValueError, match='Invalid scenario definitions'):
+        load(path)
+
+    # Missing tables are reported instead of failing on a lookup
+    path.write_text('[[scenario]]\nname = "BS"\nlca = "baseline"\nefficiency = "baseline"\nratios = [0]\n')
+    errors = check_scenario_definitions(read_scenario_file(path), SIMULATION_METHODS, METALS)
+    assert errors == ["Missing table [efficiency]", "Missing table [transfers]", "Missing table [lca_transition]",
+                      "Scenario 'BS' has an unknown efficiency table 'baseline'"]